@@ -1,22 +1,39 @@
 # Name: Pixlovarr
 # Coder: Marco Janssen (twitter @marc0janssen)
 # date: 2021-04-21 20:23:43
-# update: 2022-01-17 09:14:43
+# update: 2026-10-18 16:23:20
 
 from telegram import (
     InlineKeyboardMarkup,
     InlineKeyboardButton,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
     error
 )
 from telegram.ext import (
     Updater,
+    Dispatcher,
+    JobQueue,
+    ExtBot,
     CommandHandler,
     CallbackQueryHandler,
+    InlineQueryHandler,
     MessageHandler,
-    Filters
+    Filters,
+    Defaults
 )
+from telegram.utils.request import Request
+from tornado.web import HTTPError
 from urllib.parse import urlparse
-from time import time, sleep
+from urllib.request import urlopen
+from time import time, monotonic
+from threading import Lock, RLock, Condition, Thread, BoundedSemaphore
+from collections import deque
+from contextlib import closing
+from queue import Queue, Full
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left
+from array import array
 from datetime import datetime, timedelta, date
 
 from pycliarr.api import (
@@ -25,6 +42,7 @@ from pycliarr.api import (
 from pycliarr.api import (
     SonarrCli, SonarrSerieItem
 )
+from pycliarr.api import CliArrError
 
 from arrapi import SonarrAPI, RadarrAPI, exceptions
 
@@ -40,13 +58,133 @@ import feedparser
 import ssl
 import os
 import glob
+import secrets
+import sqlite3
+import gzip
+import zlib
+import http.client
+
+try:
+    # Supports a timeout on matching, used for the re: search patterns
+    import regex
+except ImportError:
+    regex = None
+
+
+class CatalogRecord():
+    # The fields of a series or movie the catalog works with. The arrapi
+    # objects carry the complete API payload, images, ratings, alternate
+    # titles and statistics, which adds up for a large library.
+
+    __slots__ = (
+        "id", "title", "sortTitle", "year", "genres", "tagsIds", "added",
+        "hasFile", "status", "path", "rating_value", "runtime",
+        "sizeOnDisk", "qualityProfileId", "tvdbId", "imdbId"
+    )
+
+    def __init__(self, media):
+        self.id = media.id
+        self.title = media.title
+        self.sortTitle = media.sortTitle
+        self.year = media.year
+        self.genres = tuple(media.genres or ())
+        self.tagsIds = tuple(media.tagsIds or ())
+        self.added = media.added
+        self.hasFile = getattr(media, "hasFile", None)
+        self.status = media.status
+        self.path = media.path
+        self.rating_value = self.parseRating(media)
+        self.runtime = media.runtime
+        self.sizeOnDisk = getattr(media, "sizeOnDisk", None)
+        self.qualityProfileId = getattr(media, "qualityProfileId", None)
+        self.tvdbId = getattr(media, "tvdbId", None)
+        self.imdbId = getattr(media, "imdbId", None)
+
+    def parseRating(self, media):
+        # arrapi reads a "rating" key, Sonarr and Radarr v3 send "ratings".
+        # Sonarr has one rating, Radarr one per source.
+
+        ratings = (getattr(media, "_data", None) or {}).get("ratings") or {}
+
+        if "value" in ratings:
+            return ratings["value"]
+
+        for source in ["imdb", "tmdb"]:
+            value = (ratings.get(source) or {}).get("value")
+            if value:
+                return value
+
+        return getattr(media, "rating_value", None)
+
+
+class TokenBucket():
+    # Allows rate sends per second, with bursts up to the capacity
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+
+    def delay(self):
+        # Seconds to wait before the next token is available
+
+        now = monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class BoundedDispatcher(Dispatcher):
+    # Hands a handler to the workers only when one is free. The queue of
+    # the workers is unbounded, this way the updates wait in the bounded
+    # update_queue instead and from there at Telegram.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.workerSlots = BoundedSemaphore(self.workers)
+
+    def run_async(self, func, *args, update=None, **kwargs):
+
+        self.workerSlots.acquire()
+
+        def runAndRelease(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+
+            finally:
+                self.workerSlots.release()
+
+        return super().run_async(
+            runAndRelease, *args, update=update, **kwargs)
+
+
+class WebhookUpdateQueue():
+    # What the webhook puts the updates in. PTB's webhook blocks its
+    # IOLoop on a full update_queue, Telegram then times out and delivers
+    # the update twice. Answering 503 makes Telegram deliver it later.
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def put(self, update):
+        try:
+            self.queue.put_nowait(update)
+
+        except Full:
+            raise HTTPError(503)
 
 
 class Pixlovarr():
 
     def __init__(self):
 
-        self.version = "1.50.0.3521"
+        self.version = "1.51.0.00000"
         self.startTime = datetime.now()
         config_dir = "./config/"
         app_dir = "./app/"
@@ -73,7 +211,34 @@ class Pixlovarr():
         self.maxCmdHistory = 50
         self.rankingLimitMin = 3
         self.rankingLimitMax = 100
-        self.listLength = 25
+        self.messageMaxLength = 4096
+        self.captionMaxLength = 1024
+        self.progressInterval = 3
+        self.pageLength = 10
+        self.resultPagesTTL = 900
+        self.inlineMaxPerType = 25
+        self.inlineLookupMinLength = 3
+        self.inlineLookupMaxHits = 5
+        self.inlineLookupTTL = 600
+        self.inlineLookupCacheSize = 500
+        self.inlineCacheTime = 60
+        self.posterCacheSize = 1000
+        self.posterFailedTTL = 7 * 86400
+
+        # Errors of Telegram about the photo itself, other bad requests
+        # are about the caption or the buttons
+        self.posterErrors = (
+            "file identifier",
+            "http url",
+            "web page content",
+            "image_process_failed",
+            "photo_invalid"
+        )
+        self.keyboardMaxButtons = 100
+        self.patternTimeLimit = 1.0
+        self.patternMaxLength = 100
+        self.patternCacheSize = 128
+        self.patternCache = {}
         self.youTubeURL = "https://www.youtube.com/watch?v="
 
         self.newsFeedSeries = "feed:https://www.metacritic.com/rss/tv"
@@ -83,6 +248,90 @@ class Pixlovarr():
 
         self.imdb = imdb.IMDb()
 
+        # Sonarr/Radarr lookups of inline queries, by query. They have
+        # their own workers, rankings fill the lookupPool with a job per
+        # entry and inline answers have to be quick.
+        self.inlineLookups = {}
+        self.inlineLock = RLock()
+        self.inlinePool = ThreadPoolExecutor(max_workers=2)
+
+        # IMDb charts by name, these change at most daily
+        self.chartLock = RLock()
+
+        # Per chart the entries resolved in Sonarr/Radarr and linked to
+        # the catalog, the rankings are rendered from these tables
+        self.rankingTables = {}
+        self.rankingLock = RLock()
+
+        # IMDb ID => TVDB/IMDb ID in Sonarr/Radarr, these never change
+        self.resolutionLock = RLock()
+
+        # Local index of the IMDb datasets, only one rebuild at a time.
+        # The charts which can be ranked from the ratings are served from
+        # the index, weighted like IMDb does with a minimum of votes.
+        self.datasetLock = Lock()
+        self.datasetChunkSize = 10000
+        self.datasetTimeout = 60
+        self.datasetMinVotes = 25000
+        self.datasetCheckInterval = 86400
+        self.datasetKinds = {
+            "movie": "movie",
+            "tvSeries": "serie",
+            "tvMiniSeries": "serie"
+        }
+        self.datasetCharts = {
+            "top250_movies": ("movie", 250, "DESC"),
+            "top250_tv": ("serie", 250, "DESC"),
+            "bottom100_movies": ("movie", 100, "ASC")
+        }
+        self.chartTypes = {
+            "top250_tv": "serie",
+            "popular100_tv": "serie",
+            "top250_movies": "movie",
+            "popular100_movies": "movie",
+            "top250_indian_movies": "movie",
+            "bottom100_movies": "movie"
+        }
+
+        # Handlers run in a pool of workers. The members, signups and
+        # blocked users are guarded by memberLock, the command history
+        # and the statistics by historyLock.
+        self.memberLock = RLock()
+        self.historyLock = RLock()
+        self.patternLock = RLock()
+        self.posterLock = RLock()
+
+        # Snapshot of the Sonarr/Radarr library per type of media
+        self.catalog = {}
+        self.catalogLock = RLock()
+        self.catalogLoadLocks = {"serie": Lock(), "movie": Lock()}
+
+        # Tag label <=> ID per type of media
+        self.tagRegistry = {}
+        self.tagLock = RLock()
+
+        # Outbound messages per chat, sent by a worker within the limits
+        # of Telegram: 30 messages a second in total, 1 a second per chat
+        # and 20 a minute per group
+        self.outbox = {}
+        self.outboxCondition = Condition()
+        self.outboxGlobalRate = 30
+        self.outboxChatRate = 1
+        self.outboxGroupRate = 20 / 60
+        self.outboxBurst = 3
+        self.globalBucket = TokenBucket(
+            self.outboxGlobalRate, self.outboxGlobalRate)
+        self.chatBuckets = {}
+        self.chatRetryAt = {}
+        self.outboxMaxRetries = 5
+        self.outboxBackoffBase = 1
+        self.outboxBackoffMax = 60
+        self.outboxStats = {"sent": 0, "retried": 0, "dropped": 0}
+
+        # Results of the list commands, paged with Prev/Next buttons
+        self.resultPages = {}
+        self.resultPagesLock = RLock()
+
         try:
             with open(self.config_file, "r") as f:
                 f.close()
@@ -93,6 +342,9 @@ class Pixlovarr():
                 self.config.read(self.config_file)
                 self.bot_token = self.config['COMMON']['BOT_TOKEN']
                 self.admin_user_id = self.config['COMMON']['ADMIN_USER_ID']
+                self.workers = int(self.config['COMMON']['WORKERS'])
+                self.media_card = True if (
+                    self.config['COMMON']['MEDIA_CARD'] == "ON") else False
                 self.users_permanent_delete_media = True if (
                     self.config['COMMON']
                     ['PERMANENT_DELETE_MEDIA'] == "ON") else False
@@ -117,6 +369,23 @@ class Pixlovarr():
                     self.rankingLimitMin,
                     self.rankingLimitMax
                 )
+                self.lookup_concurrency = int(
+                    self.config['IMDB']['LOOKUP_CONCURRENCY'])
+                self.chart_cache_ttl = int(
+                    self.config['IMDB']['CHART_CACHE_TTL_SECONDS'])
+                self.chart_refresh_interval = int(
+                    self.config['IMDB']['CHART_REFRESH_INTERVAL_SECONDS'])
+                self.imdb_dataset = True if (
+                    self.config['IMDB']['DATASET'] == "ON") else False
+                self.imdb_dataset_url = \
+                    self.config['IMDB']['DATASET_URL'].rstrip("/")
+                self.imdb_dataset_refresh_days = int(
+                    self.config['IMDB']['DATASET_REFRESH_INTERVAL_DAYS'])
+
+                # One pool for all ranking commands, the load on
+                # Sonarr/Radarr stays bounded when members run them at once
+                self.lookupPool = ThreadPoolExecutor(
+                    max_workers=self.lookup_concurrency)
 
                 # SONARR
                 self.sonarr_enabled = True if (
@@ -178,6 +447,28 @@ class Pixlovarr():
                 self.remove_after_days = int(
                     self.config['PRUNE']['REMOVE_MOVIES_AFTER_DAYS'])
 
+                # CATALOG
+                self.catalog_cache_ttl = int(
+                    self.config['CATALOG']['CACHE_TTL_SECONDS'])
+                self.catalog_refresh_interval = int(
+                    self.config['CATALOG']['REFRESH_INTERVAL_SECONDS'])
+                self.tags_cache_ttl = int(
+                    self.config['CATALOG']['TAGS_CACHE_TTL_SECONDS'])
+
+                # WEBHOOK
+                self.webhook_enabled = True if (
+                    self.config['WEBHOOK']['ENABLED'] == "ON") else False
+                self.webhook_listen = self.config['WEBHOOK']['LISTEN']
+                self.webhook_port = int(self.config['WEBHOOK']['PORT'])
+                self.webhook_url = self.config['WEBHOOK']['URL']
+                self.webhook_url_path = self.config['WEBHOOK']['URL_PATH']
+                self.webhook_cert = self.config['WEBHOOK']['CERT'] or None
+                self.webhook_key = self.config['WEBHOOK']['KEY'] or None
+                self.webhook_max_connections = int(
+                    self.config['WEBHOOK']['MAX_CONNECTIONS'])
+                self.update_queue_size = int(
+                    self.config['WEBHOOK']['UPDATE_QUEUE_SIZE'])
+
                 if self.sonarr_enabled:
                     self.sonarr_node = SonarrCli(
                         self.sonarr_url, self.sonarr_token
@@ -211,12 +502,32 @@ class Pixlovarr():
                     f"{config_dir}pixlovarr_blocked.json")
                 self.pixlovarr_data_file = (
                     f"{config_dir}pixlovarr_data.json")
+                self.pixlovarr_posters_file = (
+                    f"{config_dir}pixlovarr_posters.json")
+                self.pixlovarr_charts_file = (
+                    f"{config_dir}pixlovarr_charts.json")
+                self.pixlovarr_resolutions_file = (
+                    f"{config_dir}pixlovarr_resolutions.json")
+                self.pixlovarr_dataset_file = (
+                    f"{config_dir}pixlovarr_imdb.db")
 
                 self.signups = self.loaddata(self.pixlovarr_signups_file)
                 self.members = self.loaddata(self.pixlovarr_members_file)
                 self.blockedusers = self.loaddata(self.pixlovarr_blocked_file)
                 self.pixlovarrdata = self.loaddata(self.pixlovarr_data_file)
 
+                # Image URL => Telegram file_id, least recently used first
+                self.posters = self.loaddata(self.pixlovarr_posters_file)
+                self.posters.setdefault("fileIDs", {})
+                self.posters.setdefault("failed", {})
+
+                self.charts = self.loaddata(self.pixlovarr_charts_file)
+
+                self.resolutions = self.loaddata(
+                    self.pixlovarr_resolutions_file)
+                self.resolutions.setdefault("serie", {})
+                self.resolutions.setdefault("movie", {})
+
                 if not self.pixlovarrdata:
                     self.pixlovarrdata["uname"] = "<unknown>"
                     self.pixlovarrdata["timestamp"] = \
@@ -335,16 +646,11 @@ class Pixlovarr():
 
     def getForMedia(self, tagIDs, typeOfMedia):
 
-        if typeOfMedia == "serie":
-            tags = self.sonarrNode.all_tags()
-        else:
-            tags = self.radarrNode.all_tags()
-
         txtTags = ""
 
-        for tag in tags:
-            if tag.id in tagIDs:
-                txtTags += f"{tag.label}, "
+        for label, tagID in self.getTagLabeltoID(typeOfMedia).items():
+            if tagID in tagIDs:
+                txtTags += f"{label}, "
 
         return txtTags[:-2]
 
@@ -352,7 +658,7 @@ class Pixlovarr():
         self, update, context,
             numOfItems, queue, typeOfMedia):
 
-        txtQueue = ""
+        txtQueue = []
 
         for queueitem in queue["records"]:
 
@@ -411,22 +717,9 @@ class Pixlovarr():
 
             # else:
 
-            txtQueue += f"{text}\n\n"
+            txtQueue.append(f"{text}\n\n")
 
-            if (numOfItems % self.listLength == 0 and numOfItems != 0):
-                self.sendmessage(
-                    update.effective_chat.id,
-                    context,
-                    update.effective_user.first_name,
-                    txtQueue
-                )
-
-                txtQueue = ""
-
-                # make sure no flood
-                sleep(2)
-
-        if txtQueue != "":
+        if txtQueue:
             self.sendmessage(
                 update.effective_chat.id,
                 context,
@@ -442,6 +735,872 @@ class Pixlovarr():
     def sortOnNameDict(self, e):
         return e.name
 
+    def loadCatalog(self, typeOfMedia):
+        # Download the complete library and store it as the new local copy.
+        # Only a CatalogRecord is kept per item, showMediaInfo fetches the
+        # full series or movie when it is needed.
+
+        syncStart = datetime.utcnow()
+
+        media = []
+        if typeOfMedia == "serie":
+            if self.sonarr_enabled:
+                media = self.sonarrNode.all_series()
+        else:
+            if self.radarr_enabled:
+                media = self.radarrNode.all_movies()
+
+        snapshot = self.indexCatalog(
+            {m.id: CatalogRecord(m) for m in media})
+        snapshot["timestamp"] = time()
+        snapshot["synced"] = syncStart
+
+        with self.catalogLock:
+            self.catalog[typeOfMedia] = snapshot
+
+        return snapshot["media"]
+
+    def indexCatalog(self, items):
+        # Build the sorted list and the lookup indexes for the items
+
+        media = list(items.values())
+        media.sort(key=self.sortOnTitle)
+
+        positions = {}
+        owners = {}
+        titleTokens = {}
+        genres = {}
+        externalIDs = {}
+
+        for position, m in enumerate(media):
+            positions[m.id] = position
+
+            # TVDB ID for series, IMDb ID for movies, as the lookups return
+            externalID = m.tvdbId if m.tvdbId else m.imdbId
+            if externalID:
+                externalIDs[externalID] = m.id
+
+            # Media IDs per tag, with the usertags this is the owner index
+            for tagID in m.tagsIds:
+                owners.setdefault(tagID, set()).add(m.id)
+
+            for token in self.tokenize(m.title):
+                titleTokens.setdefault(token, set()).add(m.id)
+
+            for genre in m.genres:
+                genres.setdefault(genre.lower(), []).append(position)
+
+        # Catalog positions ordered on the date added, for the new media
+        columns = self.buildColumns(media)
+        addedOrder = sorted(
+            range(len(media)), key=columns["added"].__getitem__)
+
+        return {
+            "media": media,
+            "items": items,
+            "positions": positions,
+            "externalIDs": externalIDs,
+            "owners": owners,
+            "titleTokens": titleTokens,
+            "tokens": sorted(titleTokens),
+            "genres": {
+                genre: self.positionsToBits(genrePositions, len(media))
+                for genre, genrePositions in genres.items()
+            },
+            "columns": columns,
+            "orders": {},
+            "addedOrder": addedOrder,
+            "addedTimes": array(
+                "d", [columns["added"][i] for i in addedOrder])
+        }
+
+    def buildColumns(self, media):
+        # One array per queryable field, indexed by catalog position
+
+        columns = {
+            "year": array("l"),
+            "rating": array("d"),
+            "runtime": array("l"),
+            "size": array("q"),
+            "added": array("d"),
+            "quality": array("l"),
+            "status": []
+        }
+
+        for m in media:
+            columns["year"].append(m.year or 0)
+            columns["rating"].append(getattr(m, "rating_value", 0) or 0)
+            columns["runtime"].append(m.runtime or 0)
+            columns["size"].append(getattr(m, "sizeOnDisk", 0) or 0)
+            columns["added"].append(m.added.timestamp() if m.added else 0)
+            columns["quality"].append(
+                getattr(m, "qualityProfileId", 0) or 0)
+            columns["status"].append((m.status or "").lower())
+
+        return columns
+
+    def getSortOrder(self, snapshot, column):
+        # Rank of every catalog position for a column, computed once per
+        # snapshot on first use. The catalog itself is sorted on title.
+
+        order = snapshot["orders"].get(column)
+
+        if order is None:
+            values = snapshot["columns"][column]
+            order = array("l", [0] * len(values))
+            for rank, position in enumerate(
+                    sorted(range(len(values)), key=values.__getitem__)):
+                order[position] = rank
+
+            snapshot["orders"][column] = order
+
+        return order
+
+    def parseQuery(self, args):
+        # Take the filters and sort key out of the arguments, like:
+        # year>2015 rating>=7 size<50G added>2022-01-01 status:ended
+        # quality:4 sort:year sort:-added. Other arguments are left for
+        # the title search. Raises ValueError for invalid values.
+
+        filters = []
+        sortKey = None
+        units = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+        for arg in list(args):
+            found = re.match(
+                "^(year|rating|runtime|size|added)(>=|<=|>|<|=)(.+)$",
+                arg, re.IGNORECASE)
+
+            if found:
+                column = found.group(1).lower()
+                value = found.group(3)
+
+                if column == "size":
+                    unit = value[-1:].upper()
+                    if unit in units:
+                        value = float(value[:-1]) * units[unit]
+                elif column == "added":
+                    value = datetime.strptime(value, "%Y-%m-%d").timestamp()
+
+                filters.append((column, found.group(2), float(value)))
+                args.remove(arg)
+                continue
+
+            found = re.match("^(status|quality):(.+)$", arg, re.IGNORECASE)
+
+            if found:
+                column = found.group(1).lower()
+                value = found.group(2).lower() if column == "status" \
+                    else int(found.group(2))
+
+                filters.append((column, "=", value))
+                args.remove(arg)
+                continue
+
+            found = re.match(
+                "^sort:(-?)(title|year|rating|runtime|size|added)$",
+                arg, re.IGNORECASE)
+
+            if found:
+                sortKey = (found.group(2).lower(), found.group(1) == "-")
+                args.remove(arg)
+
+        return filters, sortKey
+
+    def queryCatalog(self, typeOfMedia, media, filters, sortKey):
+        # Filter and sort on the columns of the catalog
+
+        snapshot = self.getSnapshot(typeOfMedia)
+        columns = snapshot["columns"]
+        compare = {
+            ">": lambda a, b: a > b,
+            "<": lambda a, b: a < b,
+            ">=": lambda a, b: a >= b,
+            "<=": lambda a, b: a <= b,
+            "=": lambda a, b: a == b
+        }
+
+        if media is snapshot["media"]:
+            selection = range(len(media))
+        else:
+            selection = [
+                snapshot["positions"][m.id] for m in media
+                if m.id in snapshot["positions"]
+            ]
+
+        for column, operator, value in filters:
+            values = columns[column]
+            test = compare[operator]
+            selection = [i for i in selection if test(values[i], value)]
+
+        if sortKey and sortKey[0] != "title":
+            order = self.getSortOrder(snapshot, sortKey[0])
+            selection = sorted(
+                selection, key=order.__getitem__, reverse=sortKey[1])
+        elif sortKey and sortKey[1]:
+            selection = sorted(selection, reverse=True)
+
+        return [snapshot["media"][i] for i in selection]
+
+    def tokenize(self, text):
+        return re.findall(r"\w+", text.lower())
+
+    def positionsToBits(self, positions, size):
+        # A set of catalog positions as one integer, bit n is position n
+
+        mask = bytearray((size + 7) // 8)
+        for position in positions:
+            mask[position >> 3] |= 1 << (position & 7)
+
+        return int.from_bytes(mask, "little")
+
+    def bitsToPositions(self, bits):
+        return [
+            position for position, bit in enumerate(bin(bits)[:1:-1])
+            if bit == "1"
+        ]
+
+    def parseGenres(self, args):
+        # Take the genres out of the arguments. Every #genre is required,
+        # #genre1|#genre2 requires one of them and -#genre excludes.
+
+        requiredGroups = []
+        excluded = []
+
+        for arg in list(args):
+            if re.match(r"^-?#[\w-]+(\|#?[\w-]+)*$", arg):
+                group = [
+                    genre.lstrip("#").lower()
+                    for genre in arg.lstrip("-").split("|")
+                ]
+
+                if arg.startswith("-"):
+                    excluded.extend(group)
+                else:
+                    requiredGroups.append(group)
+
+                args.remove(arg)
+
+        return requiredGroups, excluded
+
+    def matchGenres(self, snapshot, requiredGroups, excluded):
+        # A few bitwise operations on the genre bitsets per group
+
+        genreBits = snapshot["genres"]
+        bits = (1 << len(snapshot["media"])) - 1
+
+        for group in requiredGroups:
+            groupBits = 0
+            for genre in group:
+                groupBits |= genreBits.get(genre, 0)
+
+            bits &= groupBits
+
+        for genre in excluded:
+            bits &= ~genreBits.get(genre, 0)
+
+        return bits
+
+    def searchCatalog(self, typeOfMedia, media, genres, words):
+        # Narrow the media down with the genre and title index. Every word
+        # has to be the start of a word in the title. The result keeps
+        # the order of the catalog.
+
+        snapshot = self.getSnapshot(typeOfMedia)
+        requiredGroups, excluded = genres
+
+        matchIDs = None
+        if requiredGroups or excluded:
+            matchIDs = {
+                snapshot["media"][position].id for position in
+                self.bitsToPositions(self.matchGenres(
+                    snapshot, requiredGroups, excluded))
+            }
+
+        for word in self.tokenize(' '.join(words)):
+            wordIDs = set()
+
+            # All title words starting with word are next to each other
+            tokens = snapshot["tokens"]
+            index = bisect_left(tokens, word)
+            while index < len(tokens) and tokens[index].startswith(word):
+                wordIDs |= snapshot["titleTokens"][tokens[index]]
+                index += 1
+
+            matchIDs = wordIDs if matchIDs is None else matchIDs & wordIDs
+
+            if not matchIDs:
+                break
+
+        if matchIDs is None:
+            return media
+
+        if media is not snapshot["media"]:
+            matchIDs &= {m.id for m in media}
+
+        return [
+            snapshot["items"][mediaID] for mediaID in
+            sorted(matchIDs, key=snapshot["positions"].get)
+        ]
+
+    def getSnapshot(self, typeOfMedia):
+        # Return the local copy, only the very first call has to wait
+        # for a full download. Keeping it current is done by syncCatalog.
+
+        with self.catalogLock:
+            snapshot = self.catalog.get(typeOfMedia)
+
+        if snapshot is None:
+            self.reloadCatalog(typeOfMedia)
+
+            with self.catalogLock:
+                snapshot = self.catalog.get(typeOfMedia)
+
+        return snapshot
+
+    def reloadCatalog(self, typeOfMedia, maxAge=None):
+        # Only one full download per type of media at a time. Callers who
+        # waited for it use that copy instead of downloading it again.
+
+        with self.catalogLoadLocks[typeOfMedia]:
+            with self.catalogLock:
+                snapshot = self.catalog.get(typeOfMedia)
+
+            if snapshot is None or maxAge is not None and \
+                    time() - snapshot["timestamp"] > maxAge:
+                self.loadCatalog(typeOfMedia)
+
+    def getCatalog(self, typeOfMedia):
+        return self.getSnapshot(typeOfMedia)["media"]
+
+    def getMediaForTag(self, typeOfMedia, tagID):
+        # Only the media of the tag is looked at, not the whole catalog
+
+        snapshot = self.getSnapshot(typeOfMedia)
+
+        media = [
+            snapshot["items"][mediaID]
+            for mediaID in snapshot["owners"].get(tagID, ())
+        ]
+        media.sort(key=self.sortOnTitle)
+
+        return media
+
+    def getNewMedia(self, typeOfMedia, days):
+        # The media added in the last days, found with a bisect on the
+        # added index instead of checking the date of every item
+
+        snapshot = self.getSnapshot(typeOfMedia)
+
+        start = bisect_left(
+            snapshot["addedTimes"], time() - days * 86400)
+
+        return [
+            snapshot["media"][position]
+            for position in sorted(snapshot["addedOrder"][start:])
+        ]
+
+    def parsePeriod(self, args, default):
+        # Take an optional period like 14d from the arguments
+
+        for arg in args:
+            if re.match(r"^\d+[Dd]$", arg):
+                args.remove(arg)
+                return int(arg[:-1])
+
+        return default
+
+    def countMediaForMember(self, typeOfMedia, person):
+
+        if typeOfMedia == "serie" and not self.sonarr_enabled or \
+                typeOfMedia == "movie" and not self.radarr_enabled:
+            return 0
+
+        tagID = self.getTagLabeltoID(typeOfMedia).get(
+            self.createTagName(person['fname'], person['id']))
+
+        return len(self.getSnapshot(typeOfMedia)["owners"].get(tagID, ()))
+
+    def applyCatalogChanges(
+            self, typeOfMedia, changedMedia, removedIDs, synced=None):
+        # Merge changed and removed items into the local copy.
+        # The snapshot is replaced, so handlers still working with the
+        # previous snapshot are not affected.
+
+        with self.catalogLock:
+            snapshot = self.catalog.get(typeOfMedia)
+            if snapshot is None:
+                return
+
+            # Nothing changed, the indexes and sort orders are kept
+            if not changedMedia and not removedIDs:
+                if synced:
+                    snapshot["synced"] = synced
+                return
+
+            items = dict(snapshot["items"])
+
+            for mediaID in removedIDs:
+                items.pop(int(mediaID), None)
+
+            for m in changedMedia:
+                items[m.id] = CatalogRecord(m)
+
+            updated = self.indexCatalog(items)
+            updated["timestamp"] = snapshot["timestamp"]
+            updated["synced"] = synced if synced else snapshot["synced"]
+
+            self.catalog[typeOfMedia] = updated
+
+    def patchCatalog(self, typeOfMedia, media):
+        self.applyCatalogChanges(typeOfMedia, [media], [])
+
+    def removeFromCatalog(self, typeOfMedia, mediaID):
+        self.applyCatalogChanges(typeOfMedia, [], [mediaID])
+
+    def getChangedMediaIDs(self, typeOfMedia, since):
+        # Ask the history of Sonarr/Radarr which items changed since
+
+        if typeOfMedia == "serie":
+            node = self.sonarr_node
+            idField = "seriesId"
+        else:
+            node = self.radarr_node
+            idField = "movieId"
+
+        history = node.request_get(
+            f"{node.api_url_base}/history/since",
+            url_params={"date": since.strftime("%Y-%m-%dT%H:%M:%SZ")}
+        )
+
+        changedIDs = set()
+        for historyItem in history:
+            if historyItem.get(idField):
+                changedIDs.add(historyItem[idField])
+
+        return changedIDs
+
+    def syncCatalog(self, typeOfMedia):
+        # Apply only the changes since the last sync. Once the local copy
+        # is older than the TTL a full reconciliation is done, this also
+        # picks up media which was added or deleted outside Pixlovarr.
+
+        if typeOfMedia == "serie" and not self.sonarr_enabled or \
+                typeOfMedia == "movie" and not self.radarr_enabled:
+            return
+
+        with self.catalogLock:
+            snapshot = self.catalog.get(typeOfMedia)
+
+        if snapshot is None or \
+                time() - snapshot["timestamp"] > self.catalog_cache_ttl:
+            self.reloadCatalog(typeOfMedia, self.catalog_cache_ttl)
+            return
+
+        syncStart = datetime.utcnow()
+
+        changedMedia = []
+        removedIDs = []
+
+        for mediaID in self.getChangedMediaIDs(
+                typeOfMedia, snapshot["synced"]):
+            try:
+                if typeOfMedia == "serie":
+                    changedMedia.append(
+                        self.sonarrNode.get_series(series_id=mediaID))
+                else:
+                    changedMedia.append(
+                        self.radarrNode.get_movie(movie_id=mediaID))
+
+            except exceptions.NotFound:
+                removedIDs.append(mediaID)
+
+        self.applyCatalogChanges(
+            typeOfMedia, changedMedia, removedIDs, syncStart)
+
+    def refreshCatalog(self, context):
+        # Job for the jobqueue, keeps the local copies current
+
+        for typeOfMedia in ["serie", "movie"]:
+            try:
+                self.syncCatalog(typeOfMedia)
+
+            except (exceptions.ArrException, CliArrError) as e:
+                logging.warning(
+                    f"Refreshing the {typeOfMedia} catalog failed. "
+                    f"MSG: {e}"
+                )
+
+    def fetchChart(self, chartName):
+        # Download a chart, only the fields the rankings use are kept
+
+        items = self.getDatasetChart(chartName)
+
+        if not items:
+            media = getattr(self.imdb, f"get_{chartName}")()
+
+            items = [
+                {
+                    "movieID": m.movieID,
+                    "title": m.get('title'),
+                    "year": m.get('year')
+                }
+                for m in media
+            ]
+
+        chart = {
+            "timestamp": time(),
+            "items": items
+        }
+
+        with self.chartLock:
+            self.charts[chartName] = chart
+            self.savedata(self.pixlovarr_charts_file, self.charts)
+
+        return chart
+
+    def getChart(self, chartName):
+        # Served from the cache on disk, IMDb is only asked when the chart
+        # is older than the TTL. An old chart beats no chart.
+
+        with self.chartLock:
+            chart = self.charts.get(chartName)
+
+        if chart is None or \
+                time() - chart["timestamp"] > self.chart_cache_ttl:
+            try:
+                chart = self.fetchChart(chartName)
+
+            except imdb.IMDbError as e:
+                logging.warning(
+                    f"Fetching the IMDb chart {chartName} failed. MSG: {e}"
+                )
+
+                if chart is None:
+                    return []
+
+        return chart["items"]
+
+    def refreshCharts(self, context):
+        # Job for the jobqueue, refreshes the charts which were used and
+        # are about to expire, so members never wait for IMDb
+
+        with self.chartLock:
+            chartNames = [
+                chartName for chartName, chart in self.charts.items()
+                if time() - chart["timestamp"] >
+                self.chart_cache_ttl - self.chart_refresh_interval
+            ]
+
+        for chartName in chartNames:
+            try:
+                self.fetchChart(chartName)
+
+            except imdb.IMDbError as e:
+                logging.warning(
+                    f"Refreshing the IMDb chart {chartName} failed. "
+                    f"MSG: {e}"
+                )
+
+    def resolveRanking(self, typeOfMedia, items, progress, start, total):
+        # Look up the entries of a chart in Sonarr/Radarr. The lookups run
+        # in parallel, the results are taken in the order of the ranking.
+
+        lookups = [
+            self.lookupPool.submit(self.resolveEntry, typeOfMedia, m)
+            for m in items
+        ]
+
+        rows = []
+        for count, lookup in enumerate(lookups, start):
+
+            if progress:
+                self.updateProgress(
+                    progress, f"{count}/{total} looked up...")
+
+            rows.append(lookup.result())
+
+        return rows
+
+    def resolveEntry(self, typeOfMedia, item):
+        # An entry of a chart in Sonarr/Radarr, a match on the IMDb ID
+        # never changes and is kept for good
+
+        imdbID = f"tt{item['movieID']}"
+
+        with self.resolutionLock:
+            row = self.resolutions[typeOfMedia].get(item['movieID'])
+
+        if row is not None:
+            return dict(row)
+
+        foundMedia = self.lookupRanking(typeOfMedia, imdbID, item['title'])
+
+        if foundMedia is None:
+            return {"mediaID": None}
+
+        row = {
+            "mediaID": foundMedia.tvdbId if typeOfMedia == "serie"
+            else foundMedia.imdbId,
+            "title": foundMedia.title,
+            "year": foundMedia.year
+        }
+
+        with self.resolutionLock:
+            self.resolutions[typeOfMedia][item['movieID']] = row
+            self.savedata(
+                self.pixlovarr_resolutions_file, self.resolutions)
+
+        return dict(row)
+
+    def getRankingTable(self, chartName, amount, progress=None):
+        # The first amount entries of a chart. Only the entries the table
+        # is missing are looked up, it starts over when the chart changed
+        # and is linked again when the catalog changed.
+
+        typeOfMedia = self.chartTypes[chartName]
+        items = self.getChart(chartName)
+
+        with self.chartLock:
+            chartTimestamp = self.charts.get(
+                chartName, {}).get("timestamp")
+
+        snapshot = self.getSnapshot(typeOfMedia)
+        amount = min(amount, len(items))
+
+        with self.rankingLock:
+            table = self.rankingTables.get(chartName)
+
+        if table is None or table["chart"] != chartTimestamp:
+            table = {"chart": chartTimestamp, "snapshot": None, "rows": []}
+
+        rows = table["rows"]
+        if len(rows) < amount:
+            rows = rows + self.resolveRanking(
+                typeOfMedia, items[len(rows):amount],
+                progress, len(rows), amount
+            )
+
+        if rows is not table["rows"] or table["snapshot"] is not snapshot:
+            table = {
+                "chart": chartTimestamp,
+                "snapshot": snapshot,
+                "rows": [
+                    dict(row, catalogID=snapshot["externalIDs"].get(
+                        row["mediaID"]))
+                    for row in rows
+                ]
+            }
+
+            with self.rankingLock:
+                self.rankingTables[chartName] = table
+
+        return table["rows"][:amount]
+
+    def refreshRankings(self, context):
+        # Job for the jobqueue, keeps the tables of the cached charts
+        # complete and current, members get their ranking from memory
+
+        with self.chartLock:
+            chartNames = list(self.charts)
+
+        for chartName in chartNames:
+            try:
+                self.getRankingTable(chartName, self.rankingLimitMax)
+
+            except (exceptions.ArrException, CliArrError) as e:
+                logging.warning(
+                    f"Refreshing the ranking {chartName} failed. MSG: {e}"
+                )
+
+    def queryDataset(self, query, params):
+        # A connection per query, a rebuild replaces the file of the index
+
+        if not self.imdb_dataset or \
+                not os.path.exists(self.pixlovarr_dataset_file):
+            return []
+
+        try:
+            with closing(sqlite3.connect(
+                    f"file:{self.pixlovarr_dataset_file}?mode=ro",
+                    uri=True)) as db:
+                return db.execute(query, params).fetchall()
+
+        except sqlite3.Error as e:
+            logging.warning(f"Querying the IMDb index failed. MSG: {e}")
+
+            return []
+
+    def getDatasetChart(self, chartName):
+        # Ranked on the weighted rating, the mean of all titles of the kind
+        # counts for datasetMinVotes votes
+
+        if chartName not in self.datasetCharts:
+            return []
+
+        kind, amount, order = self.datasetCharts[chartName]
+
+        mean = self.queryDataset(
+            "SELECT AVG(rating) FROM titles WHERE kind = ? AND votes >= ?",
+            (kind, self.datasetMinVotes)
+        )
+
+        if not mean or mean[0][0] is None:
+            return []
+
+        rows = self.queryDataset(
+            f"SELECT tconst, title, year FROM titles "
+            f"WHERE kind = ? AND votes >= ? "
+            f"ORDER BY (votes * rating + ? * ?) / (votes + ?) {order} "
+            f"LIMIT ?",
+            (
+                kind, self.datasetMinVotes, self.datasetMinVotes,
+                mean[0][0], self.datasetMinVotes, amount
+            )
+        )
+
+        return [
+            {"movieID": f"{tconst:07d}", "title": title, "year": year}
+            for tconst, title, year in rows
+        ]
+
+    def getDatasetRating(self, imdbID):
+        # IMDb rating and votes of a title, None when it isn't indexed
+
+        if not imdbID or not re.match(r"^tt\d+$", imdbID):
+            return None
+
+        rows = self.queryDataset(
+            "SELECT rating, votes FROM titles WHERE tconst = ?",
+            (int(imdbID[2:]),)
+        )
+
+        return rows[0] if rows else None
+
+    def parseDatasetRating(self, fields):
+        # tconst, averageRating, numVotes
+        return (int(fields[0][2:]), float(fields[1]), int(fields[2]))
+
+    def parseDatasetBasics(self, fields):
+        # tconst, titleType, primaryTitle, originalTitle, isAdult,
+        # startYear, ... only series and movies are kept
+
+        kind = self.datasetKinds.get(fields[1])
+        if kind is None:
+            return None
+
+        year = int(fields[5]) if fields[5].isdigit() else None
+
+        return (int(fields[0][2:]), kind, fields[2], year)
+
+    def ingestDataset(self, db, fileName, query, parse):
+        # The gzipped TSV is streamed and inserted in chunks, the dataset
+        # never is in memory as a whole
+
+        # The timeout is per read, a stalled download fails instead of
+        # holding the rebuild forever
+        with urlopen(
+                f"{self.imdb_dataset_url}/{fileName}",
+                timeout=self.datasetTimeout) as response, \
+                gzip.open(response, "rt", encoding="utf-8") as tsv:
+
+            # Skip the header
+            next(tsv, None)
+
+            rows = []
+            for line in tsv:
+                row = parse(line.rstrip("\n").split("\t"))
+                if row is not None:
+                    rows.append(row)
+
+                if len(rows) >= self.datasetChunkSize:
+                    db.executemany(query, rows)
+                    rows = []
+
+            db.executemany(query, rows)
+
+        db.commit()
+
+    def buildDataset(self):
+        # Build the index in a new file and swap it in, lookups keep using
+        # the previous index in the meantime. False when a rebuild is
+        # running already.
+
+        if not self.datasetLock.acquire(blocking=False):
+            return False
+
+        try:
+            tmpFile = f"{self.pixlovarr_dataset_file}.tmp"
+            if os.path.exists(tmpFile):
+                os.remove(tmpFile)
+
+            with closing(sqlite3.connect(tmpFile)) as db:
+                db.execute(
+                    "CREATE TABLE ratings (tconst INTEGER PRIMARY KEY, "
+                    "rating REAL, votes INTEGER)"
+                )
+                db.execute(
+                    "CREATE TABLE basics (tconst INTEGER PRIMARY KEY, "
+                    "kind TEXT, title TEXT, year INTEGER)"
+                )
+
+                self.ingestDataset(
+                    db, "title.ratings.tsv.gz",
+                    "INSERT INTO ratings VALUES (?, ?, ?)",
+                    self.parseDatasetRating
+                )
+                self.ingestDataset(
+                    db, "title.basics.tsv.gz",
+                    "INSERT INTO basics VALUES (?, ?, ?, ?)",
+                    self.parseDatasetBasics
+                )
+
+                # Only rated series and movies end up in the index
+                db.execute(
+                    "CREATE TABLE titles (tconst INTEGER PRIMARY KEY, "
+                    "kind TEXT, title TEXT, year INTEGER, rating REAL, "
+                    "votes INTEGER)"
+                )
+                db.execute(
+                    "INSERT INTO titles SELECT b.tconst, b.kind, b.title, "
+                    "b.year, r.rating, r.votes FROM basics b "
+                    "JOIN ratings r ON r.tconst = b.tconst"
+                )
+                db.execute(
+                    "CREATE INDEX titles_kind_votes ON titles (kind, votes)")
+                db.execute("DROP TABLE basics")
+                db.execute("DROP TABLE ratings")
+                db.commit()
+
+                db.execute("VACUUM")
+
+            os.replace(tmpFile, self.pixlovarr_dataset_file)
+
+            logging.info("The IMDb index is rebuilt.")
+
+            return True
+
+        finally:
+            self.datasetLock.release()
+
+    def refreshDataset(self, context):
+        # Job for the jobqueue, rebuilds the index when it is missing or
+        # older than the refresh interval
+
+        if os.path.exists(self.pixlovarr_dataset_file) and \
+                time() - os.path.getmtime(self.pixlovarr_dataset_file) < \
+                self.imdb_dataset_refresh_days * 86400:
+            return
+
+        try:
+            self.buildDataset()
+
+        # A truncated download raises IncompleteRead or EOFError, a
+        # corrupt one zlib.error
+        except (OSError, EOFError, ValueError, zlib.error,
+                http.client.HTTPException, sqlite3.Error) as e:
+            logging.warning(f"Rebuilding the IMDb index failed. MSG: {e}")
+
     def addItemToHistory(self, update, cmd, uname, uid):
 
         if self.isAdmin(update) and not self.exclude_admin \
@@ -457,10 +1616,11 @@ class Pixlovarr():
             historyItem["uname"] = uname
             historyItem["uid"] = uid
 
-            self.cmdHistory.append(historyItem)
+            with self.historyLock:
+                self.cmdHistory.append(historyItem)
 
-            if len(self.cmdHistory) > self.maxCmdHistory:
-                self.cmdHistory.pop(0)
+                if len(self.cmdHistory) > self.maxCmdHistory:
+                    self.cmdHistory.pop(0)
 
     def isAdmin(self, update):
         return True \
@@ -475,6 +1635,20 @@ class Pixlovarr():
     def isGranted(self, update):
         return str(update.effective_user.id) in self.members
 
+    def listPersons(self, persons):
+        # A copy, a grant or block in another worker can change the dict
+        with self.memberLock:
+            return list(persons.values())
+
+    def getChatID(self, update):
+        # A button on an inline message has no chat, answer the member
+        # in the private chat with the bot
+
+        if update.effective_chat:
+            return update.effective_chat.id
+
+        return update.effective_user.id
+
     def datetime_from_utc_to_local(self, utc_datetime):
         now_timestamp = time()
         offset = datetime.fromtimestamp(
@@ -501,15 +1675,21 @@ class Pixlovarr():
             return {}
 
     def savedata(self, file, dataDictonary):
+        # Write a temporary file and swap it in, a crash or a concurrent
+        # save never leaves a half written file. The caller holds the lock
+        # of the dictionary.
+
         try:
-            with open(file, 'w') as f:
+            with open(f"{file}.tmp", 'w') as f:
                 f.write(json.dumps(dataDictonary))
-                f.close
+
+            os.replace(f"{file}.tmp", file)
 
         except IOError:
             logging.warning(f"Can't write file {file}.")
 
-    def outputMediaInfo(self, update, context, typeOfMedia, media):
+    def outputMediaInfo(
+            self, update, context, typeOfMedia, media, keyboard=None):
 
         txtMediaInfo = ""
 
@@ -522,18 +1702,6 @@ class Pixlovarr():
 
         caption = f"{media.title} ({media.year})"
 
-        try:
-            context.bot.send_photo(
-                chat_id=update.effective_chat.id,
-                photo=image, caption=caption
-            )
-        except error.BadRequest:
-            image = self.urlNoImage
-            context.bot.send_photo(
-                chat_id=update.effective_chat.id,
-                photo=image, caption=caption
-            )
-
         try:
             if media.overview:
                 textoverview = f"{media.overview[:4092]}\n\n" if \
@@ -595,6 +1763,17 @@ class Pixlovarr():
         except AttributeError:
             pass
 
+        try:
+            imdbRating = self.getDatasetRating(media.imdbId)
+            if imdbRating:
+                txtMediaInfo += (
+                    f"IMDb rating: {imdbRating[0]} "
+                    f"votes: {imdbRating[1]}\n\n"
+                )
+
+        except AttributeError:
+            pass
+
         try:
             if media.runtime > 0:
                 txtRuntime = f"Runtime: {media.runtime} minutes\n\n"
@@ -640,27 +1819,86 @@ class Pixlovarr():
         if typeOfMedia == "movie" and self.getPruneDate(media):
             txtMediaInfo += f"Prune: {self.getPruneDate(media)}"
 
+        try:
+            trailer = f"{self.youTubeURL}{media.youTubeTrailerId}" \
+                if media.youTubeTrailerId else ""
+
+        except AttributeError:
+            # No Youtube ID found
+            trailer = ""
+
+        if self.media_card:
+            self.sendMediaCard(
+                update, context, image, caption, txtMediaInfo, trailer,
+                keyboard
+            )
+
+            return
+
+        self.sendphoto(self.getChatID(update), context, image, caption)
+
         if txtMediaInfo != "":
 
             self.sendmessage(
-                update.effective_chat.id,
+                self.getChatID(update),
                 context,
                 update.effective_user.first_name,
                 txtMediaInfo
             )
 
-        try:
-            if media.youTubeTrailerId:
-                self.sendmessage(
-                    update.effective_chat.id,
-                    context,
-                    update.effective_user.first_name,
-                    f"{self.youTubeURL}{media.youTubeTrailerId}"
-                )
+        if trailer:
+            self.sendmessage(
+                self.getChatID(update),
+                context,
+                update.effective_user.first_name,
+                trailer
+            )
 
-        except AttributeError:
-            # No Youtube ID found
-            pass
+        if keyboard:
+            reply_markup = InlineKeyboardMarkup(keyboard)
+
+            self.replytext(
+                update.callback_query,
+                "Actions:",
+                reply_markup,
+                False
+            )
+
+    def sendMediaCard(
+            self, update, context, image, title, txtMediaInfo, trailer,
+            keyboard):
+        # One message with the poster, the info as caption, the trailer
+        # and the buttons. Whatever doesn't fit in the caption, mostly the
+        # overview, follows in one message.
+
+        caption = title
+        overflow = ""
+
+        for section in txtMediaInfo.split("\n\n"):
+            if not section:
+                continue
+
+            if len(caption) + len(section) + 2 <= self.captionMaxLength:
+                caption += f"\n\n{section}"
+            else:
+                overflow += f"{section}\n\n"
+
+        keyboard = list(keyboard) if keyboard else []
+        if trailer:
+            keyboard.append([InlineKeyboardButton("Trailer", url=trailer)])
+
+        self.sendphoto(
+            self.getChatID(update), context, image, caption,
+            InlineKeyboardMarkup(keyboard) if keyboard else None
+        )
+
+        if overflow:
+            self.sendmessage(
+                self.getChatID(update),
+                context,
+                update.effective_user.first_name,
+                overflow
+            )
 
     def showCalenderMediaInfo(self, media):
 
@@ -673,122 +1911,249 @@ class Pixlovarr():
             except KeyError:
                 title = "<Title unknown>"
 
-        try:
-            dateCinema = datetime.strftime(
-                datetime.strptime(
-                    media['inCinemas'], '%Y-%m-%dT%H:%M:%SZ'), '%Y-%m-%d')
-            dateText = "In cinemas"
-        except KeyError:
-            try:
-                dateCinema = media['airDate']
-                dateText = "Airdate"
-            except KeyError:
-                dateCinema = "-"
-                dateText = "Date"
+        try:
+            dateCinema = datetime.strftime(
+                datetime.strptime(
+                    media['inCinemas'], '%Y-%m-%dT%H:%M:%SZ'), '%Y-%m-%d')
+            dateText = "In cinemas"
+        except KeyError:
+            try:
+                dateCinema = media['airDate']
+                dateText = "Airdate"
+            except KeyError:
+                dateCinema = "-"
+                dateText = "Date"
+
+        return(
+            f"{title}\n"
+            f"{dateText}: {dateCinema}\n\n"
+        )
+
+    def listMedia(
+            self,
+            update,
+            context,
+            typeOfMedia,
+            media
+    ):
+        # The number of media listed, None when the arguments were not
+        # valid and the member got an error message already
+
+        numOfCatalog = len(media)
+
+        genres = self.parseGenres(context.args)
+
+        try:
+            filters, sortKey = self.parseQuery(context.args)
+
+        except ValueError as e:
+            self.sendmessage(
+                update.effective_chat.id,
+                context,
+                update.effective_user.first_name,
+                f"The filter is not valid, "
+                f"{update.effective_user.first_name}. MSG: {e}"
+            )
+
+            return None
+
+        if self.isPattern(context.args):
+            matcher = self.getMatcher(update, context, context.args)
+            if matcher is None:
+                return None
+
+            try:
+                media = [
+                    m for m in
+                    self.searchCatalog(typeOfMedia, media, genres, [])
+                    if matcher(m.title)
+                ]
+            except TimeoutError:
+                self.notifyPatternTimeout(update, context)
+                return None
+
+        else:
+            media = self.searchCatalog(
+                typeOfMedia, media, genres, context.args)
+
+        if filters or sortKey:
+            media = self.queryCatalog(typeOfMedia, media, filters, sortKey)
+
+        if media:
+            if len(media) != numOfCatalog:
+                headtxt = (
+                    f"Listed {len(media)} of {numOfCatalog} "
+                    f"{typeOfMedia}s from the catalog."
+                )
+            else:
+                headtxt = (
+                    f"Listed {len(media)} {typeOfMedia}s "
+                    f"from the catalog."
+                )
+
+            token = self.storeResultPages(typeOfMedia, media, headtxt)
+            text, reply_markup = self.renderResultPage(token, 0)
+
+            self.replytext(
+                update,
+                text,
+                reply_markup,
+                False
+            )
+
+        return len(media)
+
+    def storeResultPages(self, typeOfMedia, media, headtxt):
+        # Keep the results for the Prev/Next buttons for a while
+
+        token = secrets.token_urlsafe(6)
+
+        with self.resultPagesLock:
+            now = time()
+            for expired in [
+                    key for key, result in self.resultPages.items()
+                    if now - result["timestamp"] > self.resultPagesTTL]:
+                del self.resultPages[expired]
+
+            self.resultPages[token] = {
+                "typeOfMedia": typeOfMedia,
+                "media": media,
+                "headtxt": headtxt,
+                "timestamp": now
+            }
+
+        return token
+
+    def renderResultPage(self, token, page):
+        # Only the requested page gets its buttons
+
+        with self.resultPagesLock:
+            result = self.resultPages.get(token)
 
-        return(
-            f"{title}\n"
-            f"{dateText}: {dateCinema}\n\n"
-        )
+        if result is None:
+            return None, None
 
-    def listMedia(
-            self,
-            update,
-            context,
-            typeOfMedia,
-            media,
-            usertagEnabled,
-            newDownloadOnly
-    ):
+        media = result["media"]
+        numOfPages = (len(media) - 1) // self.pageLength + 1
+        page = max(0, min(page, numOfPages - 1))
 
         keyboard = []
-        media.sort(key=self.sortOnTitle)
+        for m in media[
+                page * self.pageLength:(page + 1) * self.pageLength]:
 
-        genre = ""
-        if len(context.args) > 0:
-            for x in range(len(context.args)):
-                if re.match("^#[A-Za-z]+$", context.args[0]):
-                    if not genre:
-                        genre = context.args[0][1:]
-                    context.args.pop(0)
-
-        headtxt = (
-            f"The following {typeOfMedia}s "
-            f"in the catalog:"
-        )
+            callbackdata = \
+                f"showMediaInfo:{result['typeOfMedia']}:{m.id}"
 
-        numOfMedia = 0
-        for m in media:
+            keyboard.append([InlineKeyboardButton(
+                f"{m.title} ({m.year})",
+                callback_data=callbackdata)]
+            )
 
-            if usertagEnabled:
-                usertagID = self.getUsertagID(update, typeOfMedia)
-                usertagFound = usertagID in m.tags
+        navigation = []
+        if page > 0:
+            navigation.append(InlineKeyboardButton(
+                "< Prev", callback_data=f"showpage:{token}:{page - 1}"))
+        if page < numOfPages - 1:
+            navigation.append(InlineKeyboardButton(
+                "Next >", callback_data=f"showpage:{token}:{page + 1}"))
+        if navigation:
+            keyboard.append(navigation)
 
-            if newDownloadOnly:
-                if typeOfMedia == "serie":
-                    dateAfterAdded = datetime.now() - \
-                        timedelta(days=self.sonarr_period_days_added)
+        text = f"{result['headtxt']}\nPage {page + 1} of {numOfPages}"
 
-                else:
-                    dateAfterAdded = datetime.now() - \
-                        timedelta(days=self.radarr_period_days_added)
+        return text, InlineKeyboardMarkup(keyboard)
 
-                withinPeriod = True if m.added >= \
-                    dateAfterAdded else False
+    def isPattern(self, words):
+        return ' '.join(words).startswith("re:")
 
-            if (not usertagEnabled and not newDownloadOnly) or \
-                    (usertagEnabled and usertagFound) or \
-                    (newDownloadOnly and withinPeriod):
+    def compilePattern(self, pattern):
+        # Compiled patterns are kept, members tend to repeat their searches
 
-                if re.search(
-                    ' '.join(context.args).lower(), m.title.lower()) \
-                        or not context.args:
+        compiled = self.patternCache.get(pattern)
+        if compiled is not None:
+            return compiled
 
-                    if genre.lower() in (
-                        genre.lower() for genre in m.genres) \
-                            or not genre:
+        if len(pattern) > self.patternMaxLength:
+            raise ValueError(
+                f"pattern is longer than {self.patternMaxLength} characters")
 
-                        callbackdata = \
-                            f"showMediaInfo:{typeOfMedia}:{m.id}"
+        if regex:
+            try:
+                compiled = regex.compile(pattern, regex.IGNORECASE)
+            except regex.error as e:
+                raise ValueError(e)
+        else:
+            # Without a timeout, refuse the usual catastrophic patterns:
+            # nested quantifiers like (a+)+ and backreferences
+            if re.search(r"\([^)]*[+*}][^)]*\)[+*{]|\\[1-9]", pattern):
+                raise ValueError("nested quantifiers are not supported")
 
-                        keyboard.append([InlineKeyboardButton(
-                            f"{m.title} ({m.year})",
-                            callback_data=callbackdata)]
-                        )
+            try:
+                compiled = re.compile(pattern, re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(e)
 
-                        numOfMedia += 1
+        with self.patternLock:
+            if len(self.patternCache) >= self.patternCacheSize:
+                self.patternCache.pop(next(iter(self.patternCache)))
 
-                        if (numOfMedia % self.listLength == 0 and
-                                numOfMedia != 0):
+            self.patternCache[pattern] = compiled
 
-                            if numOfMedia >= self.listLength:
-                                headtxt = "Next section of the catalog:"
+        return compiled
 
-                            reply_markup = InlineKeyboardMarkup(keyboard)
+    def getMatcher(self, update, context, words):
+        # Search text is matched literally, unless it starts with re:
+        # then it is a pattern. The matcher is made once per command.
+        # Returns None when the pattern is invalid.
 
-                            self.replytext(
-                                update,
-                                headtxt,
-                                reply_markup,
-                                False
-                            )
+        searchText = ' '.join(words)
 
-                            keyboard = []
+        if not self.isPattern(words):
+            needle = searchText.lower()
 
-                            # make sure no flood
-                            sleep(2)
+            def matchText(text):
+                return needle in text.lower()
 
-        if keyboard:
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            return matchText
 
-            self.replytext(
-                update,
-                headtxt,
-                reply_markup,
-                False
+        try:
+            pattern = self.compilePattern(searchText[3:])
+
+        except ValueError as e:
+            self.sendmessage(
+                update.effective_chat.id,
+                context,
+                update.effective_user.first_name,
+                f"The search pattern is not valid, "
+                f"{update.effective_user.first_name}. MSG: {e}"
             )
 
-        return numOfMedia
+            return None
+
+        # One time limit for all the matching in the command
+        deadline = time() + self.patternTimeLimit
+
+        def matchPattern(text):
+            timeLeft = deadline - time()
+            if timeLeft <= 0:
+                raise TimeoutError
+
+            if regex:
+                return pattern.search(text, timeout=timeLeft) is not None
+
+            return pattern.search(text) is not None
+
+        return matchPattern
+
+    def notifyPatternTimeout(self, update, context):
+        self.sendmessage(
+            update.effective_chat.id,
+            context,
+            update.effective_user.first_name,
+            f"The search pattern took too long and was stopped, "
+            f"{update.effective_user.first_name}. "
+            f"Please try a simpler pattern."
+        )
 
     def listCalendar(self, update, context, media):
 
@@ -807,7 +2172,11 @@ class Pixlovarr():
 
         else:
 
-            allMedia = ""
+            matcher = self.getMatcher(update, context, context.args)
+            if matcher is None:
+                return 0
+
+            allMedia = []
             for m in media:
 
                 try:
@@ -815,31 +2184,20 @@ class Pixlovarr():
                 except KeyError:
                     searchString = m['title']
 
-                if re.search(
-                    ' '.join(context.args).lower(), searchString.lower()) \
-                        or not context.args:
+                try:
+                    found = not context.args or matcher(searchString)
+                except TimeoutError:
+                    self.notifyPatternTimeout(update, context)
+                    break
+
+                if found:
 
                     numOfCalItems += 1
 
-                    allMedia += (
+                    allMedia.append(
                         self.showCalenderMediaInfo(m))
 
-                    if (numOfCalItems % self.listLength == 0 and
-                            numOfCalItems != 0):
-
-                        self.sendmessage(
-                            update.effective_chat.id,
-                            context,
-                            update.effective_user.first_name,
-                            allMedia
-                        )
-
-                        allMedia = ""
-
-                        # make sure no flood
-                        sleep(2)
-
-            if allMedia != "":
+            if allMedia:
                 self.sendmessage(
                     update.effective_chat.id,
                     context,
@@ -912,29 +2270,30 @@ class Pixlovarr():
 
         if not self.isBlocked(update):
 
-            self.pixlovarrdata["uname"] = \
-                str(self.cmdHistory[-1]["uname"]) \
-                if len(self.cmdHistory) != 0 else \
-                update.effective_user.first_name
-
-            self.pixlovarrdata["timestamp"] = \
-                str(self.cmdHistory[-1]["timestamp"]) \
-                if len(self.cmdHistory) != 0 else \
-                datetime.strftime(datetime.now(), "%Y-%m-%d %H:%M:%S")
-
             logging.info(msg)
 
             self.writeLog(msg)
 
-            self.addItemToHistory(
-                update,
-                f"{update.effective_message.text}",
-                update.effective_user.first_name,
-                update.effective_user.id
-            )
+            with self.historyLock:
+                self.pixlovarrdata["uname"] = \
+                    str(self.cmdHistory[-1]["uname"]) \
+                    if len(self.cmdHistory) != 0 else \
+                    update.effective_user.first_name
+
+                self.pixlovarrdata["timestamp"] = \
+                    str(self.cmdHistory[-1]["timestamp"]) \
+                    if len(self.cmdHistory) != 0 else \
+                    datetime.strftime(datetime.now(), "%Y-%m-%d %H:%M:%S")
+
+                self.addItemToHistory(
+                    update,
+                    f"{update.effective_message.text}",
+                    update.effective_user.first_name,
+                    update.effective_user.id
+                )
 
-            self.pixlovarrdata["cmdcount"] = len(self.cmdHistory)
-            self.savedata(self.pixlovarr_data_file, self.pixlovarrdata)
+                self.pixlovarrdata["cmdcount"] = len(self.cmdHistory)
+                self.savedata(self.pixlovarr_data_file, self.pixlovarrdata)
 
         else:
             logging.warning(
@@ -1025,7 +2384,7 @@ class Pixlovarr():
         # Return the ID of the usertag if found on the server
         return tagnames.get(tagName)
 
-    def getTagLabeltoID(self, typeOfMedia):
+    def loadTags(self, typeOfMedia):
         # Put all tags in a dictonairy with pair label <=> ID
 
         TagLabeltoID = {}
@@ -1038,8 +2397,44 @@ class Pixlovarr():
                 # Add tag to lookup by it's name
                 TagLabeltoID[tag.label] = tag.id
 
+        with self.tagLock:
+            self.tagRegistry[typeOfMedia] = {
+                "labels": TagLabeltoID,
+                "timestamp": time()
+            }
+
         return TagLabeltoID
 
+    def getTagLabeltoID(self, typeOfMedia):
+        # Tags are served from the registry, the server is only asked
+        # again when the registry is older than the TTL
+
+        with self.tagLock:
+            registry = self.tagRegistry.get(typeOfMedia)
+
+        if registry is None or \
+                time() - registry["timestamp"] > self.tags_cache_ttl:
+            return self.loadTags(typeOfMedia)
+
+        return registry["labels"]
+
+    def createTag(self, typeOfMedia, label):
+        # Create the tag on the server and register it right away
+
+        if typeOfMedia == "serie":
+            tag = self.sonarrNode.create_tag(label)
+        else:
+            tag = self.radarrNode.create_tag(label)
+
+        with self.tagLock:
+            registry = self.tagRegistry.get(typeOfMedia)
+            if registry is not None:
+                labels = dict(registry["labels"])
+                labels[tag.label] = tag.id
+                registry["labels"] = labels
+
+        return tag
+
     def getIDsforTagLabels(self, typeOfmedia, tagLabels):
 
         TagLabeltoID = self.getTagLabeltoID(typeOfmedia)
@@ -1053,43 +2448,396 @@ class Pixlovarr():
 
         return tagsIDs
 
+    def enqueueMessage(self, chat_id, send, kwargs):
+        # Hand a message to the outbound worker, the handler can go on.
+        # IDs from the INI and the member lists are strings, one chat
+        # has one queue.
+
+        chat_id = int(chat_id)
+
+        with self.outboxCondition:
+            self.outbox.setdefault(chat_id, deque()).append(
+                (send, kwargs, 0))
+            self.outboxCondition.notify()
+
+    def retryMessage(self, chat_id, message, delay):
+        # Back in front of the chat, so the order within a chat is kept.
+        # The whole chat waits for the delay.
+
+        send, kwargs, attempts = message
+
+        with self.outboxCondition:
+            if attempts >= self.outboxMaxRetries:
+                self.outboxStats["dropped"] += 1
+                logging.error(
+                    f"Message to {chat_id} dropped after "
+                    f"{attempts} retries.")
+
+                return
+
+            self.outbox.setdefault(chat_id, deque()).appendleft(
+                (send, kwargs, attempts + 1))
+            self.chatRetryAt[chat_id] = monotonic() + delay
+            self.outboxStats["retried"] += 1
+            self.outboxCondition.notify()
+
+    def getBackoff(self, attempts):
+        # Exponential with jitter, chats which failed together don't
+        # retry together
+
+        return min(
+            self.outboxBackoffMax,
+            self.outboxBackoffBase * 2 ** attempts
+        ) * random.uniform(0.5, 1)
+
+    def dropMessage(self, chat_id, e):
+        logging.error(
+            f"{e} - {chat_id}.")
+
+        with self.outboxCondition:
+            self.outboxStats["dropped"] += 1
+
+    def nextQueuedMessage(self):
+        # Wait for a chat with a message and a token for it. The chats
+        # take turns, so a long list doesn't hold up the other members.
+
+        with self.outboxCondition:
+            while True:
+                wait = None
+
+                for chat_id in list(self.outbox):
+                    bucket = self.chatBuckets.get(chat_id)
+                    if bucket is None:
+                        rate = self.outboxGroupRate if chat_id < 0 \
+                            else self.outboxChatRate
+                        bucket = TokenBucket(rate, self.outboxBurst)
+                        self.chatBuckets[chat_id] = bucket
+
+                    delay = max(
+                        bucket.delay(),
+                        self.globalBucket.delay(),
+                        self.chatRetryAt.get(chat_id, 0) - monotonic()
+                    )
+
+                    if delay <= 0:
+                        bucket.take()
+                        self.globalBucket.take()
+                        self.chatRetryAt.pop(chat_id, None)
+
+                        messages = self.outbox.pop(chat_id)
+                        message = messages.popleft()
+                        if messages:
+                            # Back in line after the other chats
+                            self.outbox[chat_id] = messages
+
+                        return chat_id, message
+
+                    wait = delay if wait is None else min(wait, delay)
+
+                self.outboxCondition.wait(wait)
+
+    def sendQueuedMessages(self):
+
+        while True:
+            chat_id, message = self.nextQueuedMessage()
+            send, kwargs, attempts = message
+
+            try:
+                send(**kwargs)
+
+                with self.outboxCondition:
+                    self.outboxStats["sent"] += 1
+
+            except error.RetryAfter as e:
+                logging.warning(
+                    f"{e} - {chat_id}.")
+                self.retryMessage(chat_id, message, float(e.retry_after))
+
+            except (error.Unauthorized, error.BadRequest) as e:
+                # Retrying doesn't help
+                self.dropMessage(chat_id, e)
+
+            except error.NetworkError as e:
+                logging.warning(
+                    f"{e} - {chat_id}.")
+                self.retryMessage(chat_id, message, self.getBackoff(attempts))
+
+            except error.TelegramError as e:
+                self.dropMessage(chat_id, e)
+
+            except Exception:
+                # One bad message doesn't stop the outbox
+                logging.exception(
+                    f"Unexpected error sending a message to {chat_id}.")
+
+                with self.outboxCondition:
+                    self.outboxStats["dropped"] += 1
+
+    def packText(self, items):
+        # Fill each message up to the size limit of Telegram, a message
+        # is only split between items. An item which doesn't fit in a
+        # message by itself is split on its lines.
+
+        messages = []
+        text = ""
+
+        for item in items:
+            if len(item) > self.messageMaxLength:
+                parts = item.splitlines(keepends=True)
+            else:
+                parts = [item]
+
+            for part in parts:
+                while len(part) > self.messageMaxLength:
+                    if text:
+                        messages.append(text)
+                        text = ""
+                    messages.append(part[:self.messageMaxLength])
+                    part = part[self.messageMaxLength:]
+
+                if len(text) + len(part) > self.messageMaxLength:
+                    messages.append(text)
+                    text = ""
+
+                text += part
+
+        if text:
+            messages.append(text)
+
+        return messages
+
+    def packKeyboard(self, keyboard):
+        # Split the rows of a keyboard over as few messages as the button
+        # limit of Telegram allows, a row is never split
+
+        keyboards = []
+        rows = []
+        numOfButtons = 0
+
+        for row in keyboard:
+            if rows and numOfButtons + len(row) > self.keyboardMaxButtons:
+                keyboards.append(rows)
+                rows = []
+                numOfButtons = 0
+
+            rows.append(row)
+            numOfButtons += len(row)
+
+        if rows:
+            keyboards.append(rows)
+
+        return keyboards
+
     def sendmessage(self, chat_id, context, username, msg):
+        # A list of items is packed into as few messages as possible
+
+        items = [msg] if isinstance(msg, str) else msg
+
+        for text in self.packText(items):
+            self.enqueueMessage(
+                chat_id, context.bot.send_message,
+                {"chat_id": chat_id, "text": text}
+            )
+
+    def sendphoto(self, chat_id, context, photo, caption, reply_markup=None):
+        self.enqueueMessage(
+            chat_id, self.sendPoster,
+            {
+                "bot": context.bot,
+                "chat_id": chat_id,
+                "photo": photo,
+                "caption": caption,
+                "reply_markup": reply_markup
+            }
+        )
+
+    def sendPoster(self, bot, chat_id, photo, caption, reply_markup=None):
+        # Send a poster by the file_id of an earlier upload. A URL which
+        # Telegram couldn't fetch before goes straight to the default image.
+
+        url = self.urlNoImage if self.isFailedPoster(photo) else photo
+
+        fileID = self.getPosterFileID(url)
+        if fileID:
+            try:
+                return bot.send_photo(
+                    chat_id=chat_id, photo=fileID, caption=caption,
+                    reply_markup=reply_markup)
+            except error.BadRequest as e:
+                if not self.isPosterError(e):
+                    raise
+
+                # The file_id is no longer valid, upload it again
+                self.forgetPoster(url)
 
         try:
-            context.bot.send_message(
-                chat_id=chat_id, text=msg)
+            message = bot.send_photo(
+                chat_id=chat_id, photo=url, caption=caption,
+                reply_markup=reply_markup)
+        except error.BadRequest as e:
+            if url == self.urlNoImage or not self.isPosterError(e):
+                raise
 
-        except error.Unauthorized as e:
-            logging.error(
-                f"{e} - {username} - {chat_id}.")
+            self.rememberFailedPoster(url)
 
-        except error.NetworkError as e:
-            logging.error(
-                f"{e} - {username} - {chat_id}.")
+            return self.sendPoster(
+                bot, chat_id, self.urlNoImage, caption, reply_markup)
 
-        except error.TimedOut as e:
-            logging.error(
-                f"{e}."
-            )
+        self.rememberPoster(url, message.photo[-1].file_id)
+
+        return message
+
+    def isPosterError(self, e):
+        return any(
+            posterError in e.message.lower()
+            for posterError in self.posterErrors
+        )
+
+    def getPosterFileID(self, url):
+        with self.posterLock:
+            fileIDs = self.posters["fileIDs"]
+            fileID = fileIDs.pop(url, None)
+            if fileID:
+                # Most recently used last
+                fileIDs[url] = fileID
+
+        return fileID
+
+    def rememberPoster(self, url, fileID):
+        with self.posterLock:
+            fileIDs = self.posters["fileIDs"]
+            fileIDs[url] = fileID
+            while len(fileIDs) > self.posterCacheSize:
+                fileIDs.pop(next(iter(fileIDs)))
+
+            self.savedata(self.pixlovarr_posters_file, self.posters)
+
+    def forgetPoster(self, url):
+        with self.posterLock:
+            self.posters["fileIDs"].pop(url, None)
+            self.savedata(self.pixlovarr_posters_file, self.posters)
+
+    def isFailedPoster(self, url):
+        with self.posterLock:
+            failedAt = self.posters["failed"].get(url)
+
+        return failedAt is not None and \
+            time() - failedAt < self.posterFailedTTL
+
+    def rememberFailedPoster(self, url):
+        with self.posterLock:
+            failed = self.posters["failed"]
+            failed.pop(url, None)
+            failed[url] = time()
+            while len(failed) > self.posterCacheSize:
+                failed.pop(next(iter(failed)))
+
+            self.savedata(self.pixlovarr_posters_file, self.posters)
 
     def replytext(self, update, msg, reply_markup, quote):
+        # Works for an update and a callback query, both have a message.
+        # A keyboard over the button limit continues in the next messages.
 
-        try:
-            update.message.reply_text(
-                msg,
-                reply_markup=reply_markup,
-                quote=quote
-            )
+        if update.message:
+            chat_id = update.message.chat_id
+            send = update.message.reply_text
+            kwargs = {"quote": quote}
+        else:
+            # A callback query from an inline message
+            chat_id = update.from_user.id
+            send = update.bot.send_message
+            kwargs = {"chat_id": chat_id}
 
-        except error.Unauthorized as e:
-            logging.error(
-                f"{e}."
+        if reply_markup:
+            keyboards = self.packKeyboard(reply_markup.inline_keyboard)
+        else:
+            keyboards = []
+
+        if len(keyboards) <= 1:
+            self.enqueueMessage(
+                chat_id, send,
+                dict(kwargs, text=msg, reply_markup=reply_markup)
             )
-        except error.TimedOut as e:
-            logging.error(
-                f"{e}."
+
+            return
+
+        for count, keyboard in enumerate(keyboards):
+            self.enqueueMessage(
+                chat_id, send,
+                dict(
+                    kwargs,
+                    text=msg,
+                    reply_markup=InlineKeyboardMarkup(keyboard)
+                )
             )
 
+    def startProgress(self, update, context, text):
+        # One status message, edited while a long command is working
+
+        progress = {
+            "bot": context.bot,
+            "chat_id": self.getChatID(update),
+            "message": None,
+            "updated": time()
+        }
+
+        self.enqueueMessage(
+            progress["chat_id"], self.sendProgress,
+            {"progress": progress, "text": text}
+        )
+
+        return progress
+
+    def updateProgress(self, progress, text):
+        # Throttled, edits count towards the limits of Telegram as well
+
+        if time() - progress["updated"] < self.progressInterval:
+            return
+
+        progress["updated"] = time()
+
+        self.enqueueMessage(
+            progress["chat_id"], self.editProgress,
+            {"progress": progress, "text": text}
+        )
+
+    def finishProgress(self, progress, text, reply_markup=None):
+        # Replace the status message with the result
+
+        self.enqueueMessage(
+            progress["chat_id"], self.editProgress,
+            {
+                "progress": progress,
+                "text": text,
+                "reply_markup": reply_markup,
+                "final": True
+            }
+        )
+
+    def sendProgress(self, progress, text):
+        progress["message"] = progress["bot"].send_message(
+            chat_id=progress["chat_id"], text=text)
+
+    def editProgress(self, progress, text, reply_markup=None, final=False):
+
+        if progress["message"] is None:
+            # The status message wasn't sent, the result still is
+            if final:
+                progress["bot"].send_message(
+                    chat_id=progress["chat_id"],
+                    text=text,
+                    reply_markup=reply_markup
+                )
+
+            return
+
+        progress["bot"].edit_message_text(
+            chat_id=progress["chat_id"],
+            message_id=progress["message"].message_id,
+            text=text,
+            reply_markup=reply_markup
+        )
+
 # Default Commands
 
     def start(self, update, context):
@@ -1126,18 +2874,24 @@ class Pixlovarr():
                 self.isGranted(update) or self.isAdmin(update):
 
             if not self.isGranted(update):
-                if not str(update.effective_user.id) in self.signups:
+                with self.memberLock:
+                    isNewSignup = \
+                        str(update.effective_user.id) not in self.signups
 
-                    self.person = {}
-                    self.person['fname'] = update.effective_user.first_name
-                    self.person['lname'] = update.effective_user.last_name
-                    self.person['uname'] = update.effective_user.username
-                    self.person['id'] = str(update.effective_user.id)
-                    self.person['account'] = "normal"
+                    if isNewSignup:
+                        person = {}
+                        person['fname'] = update.effective_user.first_name
+                        person['lname'] = update.effective_user.last_name
+                        person['uname'] = update.effective_user.username
+                        person['id'] = str(update.effective_user.id)
+                        person['account'] = "normal"
 
-                    self.signups[self.person['id']] = self.person
+                        self.signups[person['id']] = person
 
-                    self.savedata(self.pixlovarr_signups_file, self.signups)
+                        self.savedata(
+                            self.pixlovarr_signups_file, self.signups)
+
+                if isNewSignup:
 
                     self.sendmessage(
                         update.effective_chat.id,
@@ -1153,7 +2907,7 @@ class Pixlovarr():
                         self.admin_user_id,
                         context,
                         "Admin",
-                        f"Hi admin, {self.person['fname']} wants access.\n"
+                        f"Hi admin, {person['fname']} wants access.\n"
                         f"Use /new to list all new members.\n"
                     )
 
@@ -1198,8 +2952,12 @@ class Pixlovarr():
                     "/lm #<genre> <key> - List all movies\n"
                     "/ms #<genre> <key> - list my series\n"
                     "/mm #<genre> <key> - list my movies\n"
-                    "/ns #<genre> <key> - list new series\n"
-                    "/nm #<genre> <key> - list new movies\n\n"
+                    "/ns <#>d #<genre> <key> - list new series\n"
+                    "/nm <#>d #<genre> <key> - list new movies\n"
+                    "Genres: #drama #comedy (and), #drama|#comedy (or), "
+                    "-#horror (not)\n"
+                    "Filters: year>, rating>, runtime>, size>50G, "
+                    "added>2022-01-01, status:, quality:, sort:-year\n\n"
                     "-- Download commands --\n"
                     "/ts T<#> - Show Top series\n"
                     "/ps T<#> - Show Top popular series\n"
@@ -1232,6 +2990,7 @@ class Pixlovarr():
                     "/bm - Show all blocked members\n"
                     "/ch - Show command history\n"
                     "/lt - list tags\n"
+                    "/ri - rebuild IMDb index\n"
                     "/open - open signup\n"
                     "/close - close signup\n"
                 )
@@ -1369,9 +3128,10 @@ class Pixlovarr():
 
                 media = self.sonarrNode.get_series(tvdb_id=mediaID)
 
-                self.pixlovarrdata["stitle"] = media.title
-                self.savedata(
-                    self.pixlovarr_data_file, self.pixlovarrdata)
+                with self.historyLock:
+                    self.pixlovarrdata["stitle"] = media.title
+                    self.savedata(
+                        self.pixlovarr_data_file, self.pixlovarrdata)
 
                 # get usertag from server and to movie
                 usertagID = self.getUsertagID(update, typeOfMedia)
@@ -1381,7 +3141,7 @@ class Pixlovarr():
                         update.effective_user.id
                     )
 
-                    newTag = self.sonarrNode.create_tag(tagName)
+                    newTag = self.createTag(typeOfMedia, tagName)
                     usertagID = newTag.id
 
                 tags = []
@@ -1400,6 +3160,8 @@ class Pixlovarr():
                         tags
                     )
 
+                    self.patchCatalog(typeOfMedia, media)
+
                     self.notifyDownload(
                         update, context, typeOfMedia, media.title, media.year)
 
@@ -1418,9 +3180,10 @@ class Pixlovarr():
             if self.radarr_enabled:
                 media = self.radarrNode.get_movie(imdb_id=mediaID)
 
-                self.pixlovarrdata["mtitle"] = media.title
-                self.savedata(
-                    self.pixlovarr_data_file, self.pixlovarrdata)
+                with self.historyLock:
+                    self.pixlovarrdata["mtitle"] = media.title
+                    self.savedata(
+                        self.pixlovarr_data_file, self.pixlovarrdata)
 
                 # get usertag from server and to movie
                 usertagID = self.getUsertagID(update, typeOfMedia)
@@ -1430,7 +3193,7 @@ class Pixlovarr():
                         update.effective_user.id
                     )
 
-                    newTag = self.radarrNode.create_tag(tagName)
+                    newTag = self.createTag(typeOfMedia, tagName)
                     usertagID = newTag.id
 
                 tags = []
@@ -1448,6 +3211,8 @@ class Pixlovarr():
                         tags
                     )
 
+                    self.patchCatalog(typeOfMedia, media)
+
                     self.notifyDownload(
                         update, context, typeOfMedia, media.title, media.year)
 
@@ -1503,23 +3268,27 @@ class Pixlovarr():
 
         if not self.isBlocked(update) and self.isGranted(update):
 
-            if self.members[str(
-                    update.effective_user.id)]['account'] == "normal":
-                self.members[str(
-                    update.effective_user.id)]['account'] = "simple"
-                txtMsg = (
-                    "This means you have less choices when downloading but you"
-                    " can quickly configure a download for a movie or series."
-                    )
-            else:
-                self.members[str(
-                    update.effective_user.id)]['account'] = "normal"
-                txtMsg = (
-                    "This means you have more choices when downloading and you"
-                    " have more control how you download a movie or series."
-                    )
+            with self.memberLock:
+                member = self.members[str(update.effective_user.id)]
+
+                if member['account'] == "normal":
+                    member['account'] = "simple"
+                    txtMsg = (
+                        "This means you have less choices when downloading "
+                        "but you can quickly configure a download for a "
+                        "movie or series."
+                        )
+                else:
+                    member['account'] = "normal"
+                    txtMsg = (
+                        "This means you have more choices when downloading "
+                        "and you have more control how you download a movie "
+                        "or series."
+                        )
 
-            self.savedata(self.pixlovarr_members_file, self.members)
+                account = member['account']
+
+                self.savedata(self.pixlovarr_members_file, self.members)
 
             self.sendmessage(
                 update.effective_chat.id,
@@ -1527,7 +3296,7 @@ class Pixlovarr():
                 update.effective_user.first_name,
                 f"Hi {update.effective_user.first_name}, your account was "
                 f"toggled to a "
-                f"{self.members[str(update.effective_user.id)]['account']}"
+                f"{account}"
                 f" account. {txtMsg}"
             )
 
@@ -1583,14 +3352,17 @@ class Pixlovarr():
                 f"Last timestamp: {str(self.pixlovarrdata['timestamp'])}\n"
                 f"Last serie: {str(self.pixlovarrdata['stitle'])}\n"
                 f"Last movie: {str(self.pixlovarrdata['mtitle'])}\n"
-                f"series: {len(self.sonarrNode.all_series())}\n"
-                f"movies: {len(self.radarrNode.all_movies())}\n"
+                f"series: {len(self.getCatalog('serie'))}\n"
+                f"movies: {len(self.getCatalog('movie'))}\n"
                 f"Items in queue: {str(numOfQueueItems)}\n"
                 f"Commands issued: {str(self.pixlovarrdata['cmdcount'])}\n"
                 f"Granted members: {len(self.members)}\n"
                 f"Blocked members: {len(self.blockedusers)}\n"
                 f"New signups: {len(self.signups)}\n"
                 f"Signup: {service}\n"
+                f"Messages sent: {self.outboxStats['sent']}\n"
+                f"Messages retried: {self.outboxStats['retried']}\n"
+                f"Messages dropped: {self.outboxStats['dropped']}\n"
                 f"Service version: {self.version}\n"
             )
 
@@ -1609,12 +3381,9 @@ class Pixlovarr():
 
             command = update.effective_message.text.split(" ")
 
-            self.sendmessage(
-                update.effective_chat.id,
-                context,
-                update.effective_user.first_name,
-                "Please be patient..."
-            )
+            # One status message, replaced by the list of the newsfeed
+            progress = self.startProgress(
+                update, context, "Please be patient...")
 
             if re.match("^/[Rr][Ss]$", command[0]):
                 typeOfMedia = "serie"
@@ -1625,12 +3394,7 @@ class Pixlovarr():
                 NewsFeed = feedparser.parse(self.newsFeedMovies)
 
             else:
-                self.sendmessage(
-                    update.effective_chat.id,
-                    context,
-                    update.effective_user.first_name,
-                    "Something went wrong..."
-                )
+                self.finishProgress(progress, "Something went wrong...")
 
                 return
 
@@ -1666,18 +3430,15 @@ class Pixlovarr():
 
                 reply_markup = InlineKeyboardMarkup(keyboard)
 
-                self.replytext(
-                    update,
+                self.finishProgress(
+                    progress,
                     f"Top 20 recently reviewed {typeOfMedia}s:",
-                    reply_markup,
-                    False
+                    reply_markup
                 )
 
             else:
-                self.sendmessage(
-                    update.effective_chat.id,
-                    context,
-                    update.effective_user.first_name,
+                self.finishProgress(
+                    progress,
                     f"There are no {typeOfMedia}s in the newsfeed."
                 )
 
@@ -1770,44 +3531,21 @@ class Pixlovarr():
         if not self.isBlocked(update) and \
                 self.isGranted(update):
 
-            self.sendmessage(
-                update.effective_chat.id,
-                context,
-                update.effective_user.first_name,
-                "Please be patient..."
-            )
-
             if self.sonarr_enabled:
-                series = self.sonarrNode.all_series()
-                series.sort(key=self.sortOnTitle)
+                series = self.getCatalog("serie")
 
                 endtext = "There is no media in the announced queue."
 
                 fqCount = 0
-                allSeries = "Series\n"
+                allSeries = ["Series\n"]
 
                 for s in series:
                     if s.status == "upcoming":
                         fqCount += 1
-                        allSeries += (
+                        allSeries.append(
                             f"{s.title} ({str(s.year)})\n")
 
-                        if (fqCount % self.listLength == 0 and
-                                fqCount != 0):
-
-                            self.sendmessage(
-                                update.effective_chat.id,
-                                context,
-                                update.effective_user.first_name,
-                                allSeries
-                            )
-
-                            allSeries = ""
-
-                            # make sure no flood
-                            sleep(2)
-
-                if allSeries != "":
+                if allSeries:
                     self.sendmessage(
                         update.effective_chat.id,
                         context,
@@ -1819,10 +3557,9 @@ class Pixlovarr():
                     f"There are {fqCount} series in the announced queue.")
 
             if self.radarr_enabled:
-                movies = self.radarrNode.all_movies()
-                movies.sort(key=self.sortOnTitle)
+                movies = self.getCatalog("movie")
 
-                allMovies = "Movies\n"
+                allMovies = ["Movies\n"]
 
                 #  for m in movies:
                 for m in movies:
@@ -1830,25 +3567,10 @@ class Pixlovarr():
                     #  if m.status == "announced":
                     if not m.hasFile:
                         fqCount += 1
-                        allMovies += (
+                        allMovies.append(
                             f"{m.title} ({str(m.year)})\n")
 
-                        if (fqCount % self.listLength == 0 and
-                                fqCount != 0):
-
-                            self.sendmessage(
-                                update.effective_chat.id,
-                                context,
-                                update.effective_user.first_name,
-                                allMovies
-                            )
-
-                            allMovies = ""
-
-                            # make sure no flood
-                            sleep(2)
-
-                if allMovies != "":
+                if allMovies:
                     self.sendmessage(
                         update.effective_chat.id,
                         context,
@@ -1878,142 +3600,140 @@ class Pixlovarr():
             topAmount = self.getTopAmount(
                 update, context, ' '.join(context.args))
 
-            self.sendmessage(
-                update.effective_chat.id,
-                context,
-                update.effective_user.first_name,
-                "Please be patient..."
-            )
-
+            progress = self.startProgress(
+                update, context, "Please be patient...")
+
             if re.match("^/[Tt][Ss]$", command[0]):
-                media = self.imdb.get_top250_tv()
+                chartName = "top250_tv"
                 typeOfMedia = "serie"
                 adjective = ""
 
             elif re.match("^/[Pp][Ss]$", command[0]):
-                media = self.imdb.get_popular100_tv()
+                chartName = "popular100_tv"
                 typeOfMedia = "serie"
                 adjective = "popular "
 
             elif re.match("^/[Tt][Mm]$", command[0]):
-                media = self.imdb.get_top250_movies()
+                chartName = "top250_movies"
                 typeOfMedia = "movie"
                 adjective = ""
 
             elif re.match("^/[Pp][Mm]$", command[0]):
-                media = self.imdb.get_popular100_movies()
+                chartName = "popular100_movies"
                 typeOfMedia = "movie"
                 adjective = "popular "
 
             elif re.match("^/[Tt][Ii]$", command[0]):
-                media = self.imdb.get_top250_indian_movies()
+                chartName = "top250_indian_movies"
                 typeOfMedia = "movie"
                 adjective = "Indian "
 
             elif re.match("^/[Ww][Mm]$", command[0]):
-                media = self.imdb.get_bottom100_movies()
+                chartName = "bottom100_movies"
                 typeOfMedia = "movie"
                 adjective = "worst "
 
             else:
-                self.sendmessage(
-                    update.effective_chat.id,
-                    context,
-                    update.effective_user.first_name,
-                    "Something went wrong..."
-                )
+                self.finishProgress(progress, "Something went wrong...")
 
                 return
 
             keyboard = []
             keyboardPresentMedia = []
 
-            for count, m in enumerate(media[:topAmount]):
-
-                if count % 12 == 0 and count != 0:
-                    phrass = [
-                        "rm -rf /homes/* ... just kidding...",
-                        "It’s hardware that makes a machine fast. It’s "
-                        "software that makes a fast machine slow...",
-                        "We will deliver before the Holidays...",
-                        "Driving up the IMDb headquaters yourself and asking "
-                        "stuff in person seems faster...",
-                        "My software never has bugs. It just develops "
-                        "random features..."
-                    ]
-
-                    self.sendmessage(
-                        update.effective_chat.id,
-                        context,
-                        update.effective_user.first_name,
-                        random.choice(phrass)
-                    )
-
-                if typeOfMedia == "serie":
-
-                    if self.sonarr_enabled:
-
-                        foundMedia = \
-                            self.sonarrNode.search_series(term=m['title'])
-
-                        if foundMedia is None:
-                            continue
-
-                        foundMedia = foundMedia[0]
-                        MediaID = foundMedia.tvdbId
-                else:
-                    if self.radarr_enabled:
-                        foundMedia = \
-                            self.radarrNode.search_movies(term=m['title'])
-                        if foundMedia is None:
-                            continue
+            # Rendered from the table of the chart, only entries which
+            # were never looked up have to wait for Sonarr/Radarr
+            for row in self.getRankingTable(chartName, topAmount, progress):
 
-                        foundMedia = foundMedia[0]
-                        MediaID = foundMedia.imdbId
+                if row["mediaID"] is None:
+                    continue
 
                 # Is a not downloaded movie? Then show download button
                 # Otherwise show mediainfo button
-                if not foundMedia.id:
+                if not row["catalogID"]:
                     callbackdata = \
-                        f"showdlsummary:{typeOfMedia}:{MediaID}"
+                        f"showdlsummary:{typeOfMedia}:{row['mediaID']}"
 
                     keyboard.append([InlineKeyboardButton(
-                        f"{foundMedia.title} ({foundMedia.year})",
+                        f"{row['title']} ({row['year']})",
                         callback_data=callbackdata)]
                     )
 
                 else:
                     callbackdata = \
-                        f"showMediaInfo:{typeOfMedia}:{foundMedia.id}"
+                        f"showMediaInfo:{typeOfMedia}:{row['catalogID']}"
 
                     keyboardPresentMedia.append([InlineKeyboardButton(
-                        f"{foundMedia.title} ({foundMedia.year})",
+                        f"{row['title']} ({row['year']})",
                         callback_data=callbackdata)]
                     )
 
-            if keyboardPresentMedia:
-                reply_markup_PresentMedia = InlineKeyboardMarkup(
-                    keyboardPresentMedia)
+            results = []
 
-                self.replytext(
-                    update,
+            if keyboardPresentMedia:
+                results.append((
                     f"We found these {adjective}{typeOfMedia}s of the "
                     f"IMDb top {topAmount} in the catalog:",
-                    reply_markup_PresentMedia,
-                    False
-                )
+                    InlineKeyboardMarkup(keyboardPresentMedia)
+                ))
 
             if keyboard:
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                results.append((
+                    f"These {adjective}{typeOfMedia}s of IMDb top {topAmount} "
+                    f"are not in the catalog at the moment:",
+                    InlineKeyboardMarkup(keyboard)
+                ))
 
+            if not results:
+                results.append((
+                    f"There were no results found, "
+                    f"{update.effective_user.first_name}.",
+                    None
+                ))
+
+            # The first result takes the place of the status message
+            self.finishProgress(progress, *results[0])
+
+            for text, reply_markup in results[1:]:
                 self.replytext(
                     update,
-                    f"These {adjective}{typeOfMedia}s of IMDb top {topAmount} "
-                    f"are not in the catalog at the moment:",
+                    text,
                     reply_markup,
                     False
                 )
 
+    def lookupRanking(self, typeOfMedia, imdbID, title):
+        # Radarr looks up a movie by its IMDb ID. Sonarr knows series by
+        # their TVDB ID, only the series of the title with the same IMDb
+        # ID is taken. Without it the entry stays unresolved.
+
+        try:
+            if typeOfMedia == "serie":
+                if not self.sonarr_enabled:
+                    return None
+
+                for serie in self.sonarrNode.search_series(term=title):
+                    if serie.imdbId == imdbID:
+                        return serie
+
+                return None
+
+            else:
+                if not self.radarr_enabled:
+                    return None
+
+                return self.radarrNode.get_movie(imdb_id=imdbID)
+
+        except exceptions.NotFound:
+            return None
+
+        except exceptions.ArrException as e:
+            logging.error(
+                f"Error looking up {title}: {e}"
+            )
+
+            return None
+
     def showQueue(self, update, context):
 
         self.logCommand(update)
@@ -2063,24 +3783,21 @@ class Pixlovarr():
 
             command = update.effective_message.text.split(" ")
 
-            self.sendmessage(
-                update.effective_chat.id,
-                context,
-                update.effective_user.first_name,
-                "Please be patient..."
-            )
-
             media = []
 
             if re.match("^/[Nn][Ss]$", command[0]):
                 typeOfMedia = "serie"
+                days = self.parsePeriod(
+                    context.args, self.sonarr_period_days_added)
                 if self.sonarr_enabled:
-                    media = self.sonarrNode.all_series()
+                    media = self.getNewMedia("serie", days)
 
             elif re.match("^/[Nn][Mm]$", command[0]):
                 typeOfMedia = "movie"
+                days = self.parsePeriod(
+                    context.args, self.radarr_period_days_added)
                 if self.radarr_enabled:
-                    media = self.radarrNode.all_movies()
+                    media = self.getNewMedia("movie", days)
 
             else:
                 self.sendmessage(
@@ -2094,27 +3811,8 @@ class Pixlovarr():
 
             if media:
                 numofMedia = self.listMedia(
-                    update, context, typeOfMedia, media, False, True)
-                if numofMedia > 0:
-                    if numofMedia != len(media):
-                        endtext = (
-                            f"Listed {numofMedia} of {len(media)} "
-                            f"{typeOfMedia}s from the catalog."
-                        )
-                    else:
-                        endtext = (
-                            f"Listed {numofMedia} {typeOfMedia}s "
-                            f"from the catalog."
-                        )
-
-                    self.sendmessage(
-                        update.effective_chat.id,
-                        context,
-                        update.effective_user.first_name,
-                        endtext
-                    )
-
-                else:
+                    update, context, typeOfMedia, media)
+                if numofMedia == 0:
                     self.sendmessage(
                         update.effective_chat.id,
                         context,
@@ -2140,24 +3838,23 @@ class Pixlovarr():
 
             command = update.effective_message.text.split(" ")
 
-            self.sendmessage(
-                update.effective_chat.id,
-                context,
-                update.effective_user.first_name,
-                "Please be patient..."
-            )
-
             media = []
 
             if re.match("^/[Mm][Ss]$", command[0]):
                 typeOfMedia = "serie"
                 if self.sonarr_enabled:
-                    media = self.sonarrNode.all_series()
+                    media = self.getMediaForTag(
+                        typeOfMedia,
+                        self.getUsertagID(update, typeOfMedia)
+                    )
 
             elif re.match("^/[Mm][Mm]$", command[0]):
                 typeOfMedia = "movie"
                 if self.radarr_enabled:
-                    media = self.radarrNode.all_movies()
+                    media = self.getMediaForTag(
+                        typeOfMedia,
+                        self.getUsertagID(update, typeOfMedia)
+                    )
 
             else:
                 self.sendmessage(
@@ -2171,27 +3868,8 @@ class Pixlovarr():
 
             if media:
                 numofMedia = self.listMedia(
-                    update, context, typeOfMedia, media, True, False)
-                if numofMedia > 0:
-                    if numofMedia != len(media):
-                        endtext = (
-                            f"Listed {numofMedia} of {len(media)} "
-                            f"{typeOfMedia}s from the catalog."
-                        )
-                    else:
-                        endtext = (
-                            f"Listed {numofMedia} {typeOfMedia}s "
-                            f"from the catalog."
-                        )
-
-                    self.sendmessage(
-                        update.effective_chat.id,
-                        context,
-                        update.effective_user.first_name,
-                        endtext
-                    )
-
-                else:
+                    update, context, typeOfMedia, media)
+                if numofMedia == 0:
                     self.sendmessage(
                         update.effective_chat.id,
                         context,
@@ -2215,25 +3893,18 @@ class Pixlovarr():
         if not self.isBlocked(update) and \
                 self.isGranted(update):
 
-            self.sendmessage(
-                update.effective_chat.id,
-                context,
-                update.effective_user.first_name,
-                "Please be patient..."
-            )
-
             command = update.effective_message.text.split(" ")
 
             media = []
 
             if re.match("^/[Ll][Ss]$", command[0]):
                 if self.sonarr_enabled:
-                    media = self.sonarrNode.all_series()
+                    media = self.getCatalog("serie")
                     typeOfMedia = "serie"
 
             elif re.match("^/[Ll][Mm]$", command[0]):
                 if self.radarr_enabled:
-                    media = self.radarrNode.all_movies()
+                    media = self.getCatalog("movie")
                     typeOfMedia = "movie"
 
             else:
@@ -2248,27 +3919,8 @@ class Pixlovarr():
 
             if media:
                 numofMedia = self.listMedia(
-                    update, context, typeOfMedia, media, False, False)
-                if numofMedia > 0:
-                    if numofMedia != len(media):
-                        endtext = (
-                            f"Listed {numofMedia} of {len(media)} "
-                            f"{typeOfMedia}s from the catalog."
-                        )
-                    else:
-                        endtext = (
-                            f"Listed {numofMedia} {typeOfMedia}s "
-                            f"from the catalog."
-                        )
-
-                    self.sendmessage(
-                        update.effective_chat.id,
-                        context,
-                        update.effective_user.first_name,
-                        endtext
-                    )
-
-                else:
+                    update, context, typeOfMedia, media)
+                if numofMedia == 0:
                     self.sendmessage(
                         update.effective_chat.id,
                         context,
@@ -2345,12 +3997,13 @@ class Pixlovarr():
         if self.isAdmin(update):
 
             tagstxt = "-- Tags --\n"
-            for member in self.members:
-                person = self.members[member]
-                strippedfname = re.sub(
-                    r'[^A-Za-z0-9]+', '', person['fname'].lower())
-                tagName = f"{strippedfname}_{person['id']}"
-                tagstxt = tagstxt + f"{tagName}\n"
+            for person in self.listPersons(self.members):
+                tagName = self.createTagName(person['fname'], person['id'])
+                tagstxt = tagstxt + (
+                    f"{tagName} - "
+                    f"{self.countMediaForMember('serie', person)} series, "
+                    f"{self.countMediaForMember('movie', person)} movies\n"
+                )
 
             self.sendmessage(
                 update.effective_chat.id,
@@ -2359,6 +4012,40 @@ class Pixlovarr():
                 tagstxt
             )
 
+    def rebuildIndex(self, update, context):
+
+        self.logAdminCommand(update)
+
+        if self.isAdmin(update):
+
+            if not self.imdb_dataset:
+                msg = "The IMDb index is not enabled."
+
+            else:
+                self.sendmessage(
+                    update.effective_chat.id,
+                    context,
+                    update.effective_user.first_name,
+                    "Rebuilding the IMDb index, this will take a while..."
+                )
+
+                try:
+                    if self.buildDataset():
+                        msg = "The IMDb index is rebuilt."
+                    else:
+                        msg = "The IMDb index is being rebuilt already."
+
+                except (OSError, EOFError, ValueError, zlib.error,
+                        http.client.HTTPException, sqlite3.Error) as e:
+                    msg = f"Rebuilding the IMDb index failed. MSG: {e}"
+
+            self.sendmessage(
+                update.effective_chat.id,
+                context,
+                update.effective_user.first_name,
+                msg
+            )
+
     def showCmdHistory(self, update, context):
 
         self.logAdminCommand(update)
@@ -2366,32 +4053,22 @@ class Pixlovarr():
         if self.isAdmin(update):
 
             endtext = "No items in the command history."
-            historytext = ""
+            historytext = []
 
-            if self.cmdHistory:
-                for count, historyItem in enumerate(self.cmdHistory):
+            with self.historyLock:
+                cmdHistory = list(self.cmdHistory)
 
-                    historytext += (
+            if cmdHistory:
+                for historyItem in cmdHistory:
+
+                    historytext.append(
                         f"{historyItem['timestamp']} - "
                         f"{historyItem['cmd']} - "
                         f"{historyItem['uname']} - "
                         f"{historyItem['uid']}\n"
                     )
 
-                    if (count % self.listLength == 0 and count != 0):
-                        self.sendmessage(
-                            update.effective_chat.id,
-                            context,
-                            update.effective_user.first_name,
-                            historytext
-                        )
-
-                        historytext = ""
-
-                        # make sure no flood
-                        sleep(2)
-
-                if historytext != "":
+                if historytext:
                     self.sendmessage(
                         update.effective_chat.id,
                         context,
@@ -2400,7 +4077,7 @@ class Pixlovarr():
                     )
 
                 endtext = (
-                    f"Found {len(self.cmdHistory)} items "
+                    f"Found {len(cmdHistory)} items "
                     f"in command history."
                 )
 
@@ -2421,8 +4098,7 @@ class Pixlovarr():
 
                 keyboard = []
 
-                for signup in self.signups:
-                    person = self.signups[signup]
+                for person in self.listPersons(self.signups):
                     row = []
                     row.append(InlineKeyboardButton(
                         f"-√- {person['fname']}",
@@ -2462,10 +4138,11 @@ class Pixlovarr():
 
                 keyboard = []
 
-                for member in self.members:
-                    person = self.members[member]
+                for person in self.listPersons(self.members):
                     keyboard.append([InlineKeyboardButton(
-                        f"-X- {person['fname']}",
+                        f"-X- {person['fname']} "
+                        f"(S:{self.countMediaForMember('serie', person)} "
+                        f"M:{self.countMediaForMember('movie', person)})",
                         callback_data=f"block:allowed:{person['id']}")]
                     )
 
@@ -2496,8 +4173,7 @@ class Pixlovarr():
 
                 keyboard = []
 
-                for member in self.blockedusers:
-                    person = self.blockedusers[member]
+                for person in self.listPersons(self.blockedusers):
                     keyboard.append([InlineKeyboardButton(
                         f"-√- {person['fname']}",
                         callback_data=f"grant:blocked:{person['id']}")]
@@ -2561,15 +4237,7 @@ class Pixlovarr():
 
             # If there not IDs yet, then create them for the first time
             if not tagIDs_To_Keep:
-                if data[1] == "serie":
-                    if self.sonarr_enabled:
-                        tag = self.sonarrNode.create_tag(
-                            tagLabels_to_keep[0])
-
-                else:
-                    if self.radarr_enabled:
-                        tag = self.radarrNode.create_tag(
-                            tagLabels_to_keep[0])
+                tag = self.createTag(data[1], tagLabels_to_keep[0])
 
                 tagIDs_To_Keep = [tag.id]
 
@@ -2580,6 +4248,8 @@ class Pixlovarr():
                     apply_tags="add"
                 )
 
+                self.patchCatalog(data[1], media)
+
                 self.sendmessage(
                     update.effective_chat.id,
                     context,
@@ -2612,15 +4282,7 @@ class Pixlovarr():
 
             # If there not IDs yet, then create them for the first time
             if not tagIDs_To_Extend:
-                if data[1] == "serie":
-                    if self.sonarr_enabled:
-                        tag = self.sonarrNode.create_tag(
-                            tagLabels_to_extend[0])
-
-                else:
-                    if self.radarr_enabled:
-                        tag = self.radarrNode.create_tag(
-                            tagLabels_to_extend[0])
+                tag = self.createTag(data[1], tagLabels_to_extend[0])
 
                 tagIDs_To_Extend = [tag.id]
 
@@ -2631,6 +4293,8 @@ class Pixlovarr():
                     apply_tags="add"
                 )
 
+                self.patchCatalog(data[1], media)
+
                 # Get modfified date on movie.nfo,
                 # Which is the downloaddate
 
@@ -2891,6 +4555,28 @@ class Pixlovarr():
             args.append(data[2])
             self.findMedia(update, context, query, data[1], args)
 
+    def showPage(self, update, context):
+        if not self.isBlocked(update) and self.isGranted(update):
+
+            query = update.callback_query
+            query.answer()
+            data = query.data.split(":")
+            # 0:marker, 1:token, 2:page
+
+            text, reply_markup = self.renderResultPage(data[1], int(data[2]))
+
+            if text is None:
+                text = (
+                    f"This list has expired, "
+                    f"{update.effective_user.first_name}. "
+                    f"Please run the command again."
+                )
+
+            self.enqueueMessage(
+                query.message.chat_id, query.edit_message_text,
+                {"text": text, "reply_markup": reply_markup}
+            )
+
     def showMediaInfo(self, update, context):
         if not self.isBlocked(update) and self.isGranted(update):
 
@@ -2910,8 +4596,6 @@ class Pixlovarr():
 
             self.logChoice(update, f"{media.title} ({media.year})")
 
-            self.outputMediaInfo(update, context, data[1], media)
-
             keyboard = []
 
             # Get ID's for keeping movies anyway
@@ -2983,15 +4667,7 @@ class Pixlovarr():
                     callback_data=callbackdata)]
                 )
 
-            if keyboard:
-                reply_markup = InlineKeyboardMarkup(keyboard)
-
-                self.replytext(
-                    query,
-                    "Actions:",
-                    reply_markup,
-                    False
-                )
+            self.outputMediaInfo(update, context, data[1], media, keyboard)
 
     def deleteQueueItem(self, update, context):
         if not self.isBlocked(update) and self.isGranted(update):
@@ -3060,6 +4736,8 @@ class Pixlovarr():
                         deleteFiles=data[3]
                     )
 
+            self.removeFromCatalog(data[1], data[2])
+
             self.logChoice(update, f"Delete {data[1]}")
 
             self.sendmessage(
@@ -3161,7 +4839,7 @@ class Pixlovarr():
 
                 else:
                     self.sendmessage(
-                        update.effective_chat.id,
+                        self.getChatID(update),
                         context,
                         update.effective_user.first_name,
                         f"No profiles were found, Please set them up in"
@@ -3324,6 +5002,122 @@ class Pixlovarr():
                 f"{update.effective_user.first_name}."
             )
 
+    def inlineResult(self, typeOfMedia, title, callbackdata):
+        return InlineQueryResultArticle(
+            id=callbackdata,
+            title=title,
+            description="Series" if typeOfMedia == "serie" else "Movie",
+            input_message_content=InputTextMessageContent(title),
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(
+                "Show info" if callbackdata.startswith("showMediaInfo")
+                else "Download",
+                callback_data=callbackdata)]])
+        )
+
+    def lookupInline(self, searchQuery):
+        # Media not in the catalog yet. Sonarr and Radarr are asked in
+        # parallel and the answers are cached per query, members typing
+        # send the same query more than once.
+
+        key = searchQuery.lower()
+
+        with self.inlineLock:
+            cached = self.inlineLookups.get(key)
+
+        if cached and time() - cached[0] < self.inlineLookupTTL:
+            return cached[1]
+
+        lookups = []
+        if self.sonarr_enabled:
+            lookups.append(("serie", self.inlinePool.submit(
+                self.sonarrNode.search_series, term=searchQuery)))
+        if self.radarr_enabled:
+            lookups.append(("movie", self.inlinePool.submit(
+                self.radarrNode.search_movies, term=searchQuery)))
+
+        found = []
+        try:
+            for typeOfMedia, lookup in lookups:
+                for m in lookup.result():
+                    mediaID = m.tvdbId if typeOfMedia == "serie" \
+                        else m.imdbId
+                    if not m.id and mediaID:
+                        found.append((
+                            typeOfMedia, f"{m.title} ({m.year})",
+                            f"showdlsummary:{typeOfMedia}:{mediaID}"
+                        ))
+
+        except exceptions.ArrException as e:
+            logging.error(
+                f"Error during inline lookup: {e}"
+            )
+
+            return found
+
+        with self.inlineLock:
+            self.inlineLookups.pop(key, None)
+            self.inlineLookups[key] = (time(), found)
+            while len(self.inlineLookups) > self.inlineLookupCacheSize:
+                self.inlineLookups.pop(next(iter(self.inlineLookups)))
+
+        return found
+
+    def inlineQuery(self, update, context):
+        # @bot <key> in any chat. The catalog answers from the index, only
+        # when it has few matches Sonarr/Radarr are asked for new media.
+        # Each type of media gets its share of the results.
+
+        if not self.isBlocked(update) and self.isGranted(update):
+
+            query = update.inline_query
+            words = query.query.split()
+
+            results = {"serie": [], "movie": []}
+
+            if words:
+                genres = self.parseGenres(words)
+
+                for typeOfMedia, enabled in [
+                        ("serie", self.sonarr_enabled),
+                        ("movie", self.radarr_enabled)]:
+
+                    if not enabled:
+                        continue
+
+                    for m in self.searchCatalog(
+                            typeOfMedia, self.getCatalog(typeOfMedia),
+                            genres, words)[:self.inlineMaxPerType]:
+                        results[typeOfMedia].append(self.inlineResult(
+                            typeOfMedia, f"{m.title} ({m.year})",
+                            f"showMediaInfo:{typeOfMedia}:{m.id}"))
+
+                searchQuery = ' '.join(words)
+
+                if len(results["serie"]) + len(results["movie"]) < \
+                        self.inlineLookupMaxHits and \
+                        len(searchQuery) >= self.inlineLookupMinLength:
+
+                    for typeOfMedia, title, callbackdata in \
+                            self.lookupInline(searchQuery):
+                        if len(results[typeOfMedia]) < \
+                                self.inlineMaxPerType:
+                            results[typeOfMedia].append(self.inlineResult(
+                                typeOfMedia, title, callbackdata))
+
+            # Results depend on the member, so Telegram caches per member
+            try:
+                query.answer(
+                    results["serie"] + results["movie"],
+                    cache_time=self.inlineCacheTime,
+                    is_personal=True
+                )
+
+            except error.BadRequest as e:
+                # The query expired before the answer
+                logging.error(
+                    f"{e}."
+                )
+
     def grantMember(self, update, context):
         if self.isAdmin(update):
 
@@ -3332,7 +5126,10 @@ class Pixlovarr():
             data = query.data.split(":")
             # 0:marker, 1:source of person, 2:userid
 
-            if (data[2] in self.signups or data[2] in self.blockedusers):
+            with self.memberLock:
+                if not (data[2] in self.signups or
+                        data[2] in self.blockedusers):
+                    return
 
                 if data[1] == "new":
                     self.members[data[2]] = self.signups[data[2]]
@@ -3347,29 +5144,31 @@ class Pixlovarr():
                 self.savedata(
                     self.pixlovarr_blocked_file, self.blockedusers)
 
-                logging.info(
-                    f"{self.members[data[2]]['fname']} - "
-                    f"{self.members[data[2]]['id']} was added"
-                    f" to the memberlist."
-                )
+                person = self.members[data[2]]
 
-                self.sendmessage(
-                    self.members[data[2]]['id'],
-                    context,
-                    self.members[data[2]]['fname'],
-                    f"Hi {self.members[data[2]]['fname']}, "
-                    f"access was granted. For your new commands, "
-                    f"please use /help."
-                )
+            logging.info(
+                f"{person['fname']} - "
+                f"{person['id']} was added"
+                f" to the memberlist."
+            )
 
-                self.sendmessage(
-                    self.admin_user_id,
-                    context,
-                    "Admin",
-                    f"Hi admin, "
-                    f"{self.members[data[2]]['fname']} "
-                    f"was granted access. Message has been sent."
-                )
+            self.sendmessage(
+                person['id'],
+                context,
+                person['fname'],
+                f"Hi {person['fname']}, "
+                f"access was granted. For your new commands, "
+                f"please use /help."
+            )
+
+            self.sendmessage(
+                self.admin_user_id,
+                context,
+                "Admin",
+                f"Hi admin, "
+                f"{person['fname']} "
+                f"was granted access. Message has been sent."
+            )
 
     def blockMember(self, update, context):
         if self.isAdmin(update):
@@ -3379,7 +5178,9 @@ class Pixlovarr():
             data = query.data.split(":")
             # 0:marker, 1:source of person, 2:userid
 
-            if (data[2] in self.signups or data[2] in self.members):
+            with self.memberLock:
+                if not (data[2] in self.signups or data[2] in self.members):
+                    return
 
                 if data[1] == "new":
                     self.blockedusers[data[2]] = self.signups[data[2]]
@@ -3394,33 +5195,51 @@ class Pixlovarr():
                 self.savedata(
                     self.pixlovarr_blocked_file, self.blockedusers)
 
-                logging.info(
-                    f"Member {self.blockedusers[data[2]]['fname']} - "
-                    f"{self.blockedusers[data[2]]['id']} was blocked."
-                )
+                person = self.blockedusers[data[2]]
 
-                self.sendmessage(
-                    self.blockedusers[data[2]]['id'],
-                    context,
-                    self.blockedusers[data[2]]['fname'],
-                    f"Hi {self.blockedusers[data[2]]['fname']}, "
-                    f"access was blocked."
-                )
+            logging.info(
+                f"Member {person['fname']} - "
+                f"{person['id']} was blocked."
+            )
 
-                self.sendmessage(
-                    self.admin_user_id,
-                    context,
-                    "Admin",
-                    f"Hi admin, "
-                    f"{self.blockedusers[data[2]]['fname']} was blocked."
-                )
+            self.sendmessage(
+                person['id'],
+                context,
+                person['fname'],
+                f"Hi {person['fname']}, "
+                f"access was blocked."
+            )
+
+            self.sendmessage(
+                self.admin_user_id,
+                context,
+                "Admin",
+                f"Hi admin, "
+                f"{person['fname']} was blocked."
+            )
 
 # Init Handlers
     def setHandlers(self):
 
         # Default Handlers
-        self.updater = Updater(token=self.bot_token, use_context=True)
-        self.dispatcher = self.updater.dispatcher
+        # Every handler runs in the pool of workers, so a long command
+        # doesn't hold up the other members. The update_queue is bounded,
+        # when the bot can't keep up the updates wait at Telegram.
+        bot = ExtBot(
+            self.bot_token,
+            request=Request(con_pool_size=self.workers + 4),
+            defaults=Defaults(run_async=True)
+        )
+        jobQueue = JobQueue()
+        self.dispatcher = BoundedDispatcher(
+            bot,
+            Queue(maxsize=self.update_queue_size),
+            job_queue=jobQueue,
+            workers=self.workers
+        )
+        jobQueue.set_dispatcher(self.dispatcher)
+
+        self.updater = Updater(dispatcher=self.dispatcher, workers=None)
 
         self.start_handler = CommandHandler('start', self.start)
         self.dispatcher.add_handler(self.start_handler)
@@ -3553,6 +5372,10 @@ class Pixlovarr():
             self.showMediaInfo, pattern='^showMediaInfo:')
         self.dispatcher.add_handler(kbshowMediaInfo_handler)
 
+        kbshowPage_handler = CallbackQueryHandler(
+            self.showPage, pattern='^showpage:')
+        self.dispatcher.add_handler(kbshowPage_handler)
+
         kbshowMetaInfo_handler = CallbackQueryHandler(
             self.showMetaInfo, pattern='^showMetaInfo:')
         self.dispatcher.add_handler(kbshowMetaInfo_handler)
@@ -3598,6 +5421,10 @@ class Pixlovarr():
         self.listtags_handler = CommandHandler('lt', self.listtags)
         self.dispatcher.add_handler(self.listtags_handler)
 
+        self.rebuildindex_handler = CommandHandler(
+            'ri', self.rebuildIndex)
+        self.dispatcher.add_handler(self.rebuildindex_handler)
+
         self.opensignup_handler = CommandHandler('open', self.opensignup)
         self.dispatcher.add_handler(self.opensignup_handler)
 
@@ -3607,9 +5434,60 @@ class Pixlovarr():
         self.unknown_handler = MessageHandler(Filters.command, self.unknown)
         self.dispatcher.add_handler(self.unknown_handler)
 
+        self.inline_handler = InlineQueryHandler(self.inlineQuery)
+        self.dispatcher.add_handler(self.inline_handler)
+
+# Jobs
+
+        self.updater.job_queue.run_repeating(
+            self.refreshCatalog,
+            interval=self.catalog_refresh_interval,
+            first=0
+        )
+
+        self.updater.job_queue.run_repeating(
+            self.refreshCharts,
+            interval=self.chart_refresh_interval,
+            first=self.chart_refresh_interval
+        )
+
+        self.updater.job_queue.run_repeating(
+            self.refreshRankings,
+            interval=self.catalog_refresh_interval,
+            first=self.catalog_refresh_interval
+        )
+
+        if self.imdb_dataset:
+            self.updater.job_queue.run_repeating(
+                self.refreshDataset,
+                interval=self.datasetCheckInterval,
+                first=0
+            )
+
     def startBot(self):
         self.setHandlers()
-        self.updater.start_polling()
+        Thread(target=self.sendQueuedMessages, daemon=True).start()
+
+        if self.webhook_enabled:
+            self.updater.update_queue = WebhookUpdateQueue(
+                self.dispatcher.update_queue)
+
+            # Without CERT and KEY the listener is plain HTTP, for use
+            # behind a reverse proxy which handles HTTPS
+            self.updater.start_webhook(
+                listen=self.webhook_listen,
+                port=self.webhook_port,
+                url_path=self.webhook_url_path,
+                cert=self.webhook_cert,
+                key=self.webhook_key,
+                webhook_url=(
+                    f"{self.webhook_url.rstrip('/')}/"
+                    f"{self.webhook_url_path}"
+                ),
+                max_connections=self.webhook_max_connections
+            )
+        else:
+            self.updater.start_polling()
 
     def stopBot(self):
         self.updater.idle()
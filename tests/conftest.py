@@ -0,0 +1,45 @@
+import os
+import sys
+from threading import Lock, RLock
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pixlovarr  # noqa: E402
+
+
+class FakeRaw():
+    new_codebase = True
+    v4 = False
+
+
+class FakeArr():
+    # Stands in for SonarrAPI/RadarrAPI, arrapi objects only need _raw
+    # to parse a payload
+
+    def __init__(self, media=()):
+        self._raw = FakeRaw()
+        self.media = list(media)
+
+    def all_series(self):
+        return self.media
+
+    def all_movies(self):
+        return self.media
+
+
+@pytest.fixture
+def bot():
+    # A Pixlovarr without the INI file, Telegram and Sonarr/Radarr
+
+    bot = pixlovarr.Pixlovarr.__new__(pixlovarr.Pixlovarr)
+    bot.catalog = {}
+    bot.catalogLock = RLock()
+    bot.catalogLoadLocks = {"serie": Lock(), "movie": Lock()}
+    bot.sonarr_enabled = True
+    bot.radarr_enabled = True
+    bot.sonarrNode = FakeArr()
+    bot.radarrNode = FakeArr()
+
+    return bot
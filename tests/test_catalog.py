@@ -0,0 +1,95 @@
+from arrapi.objs.reload import Series, Movie
+
+from conftest import FakeArr
+
+# Shaped like the payloads of Sonarr v3 and Radarr v3, which send
+# "ratings" instead of the "rating" arrapi reads
+SERIES = {
+    "id": 1,
+    "title": "The Wire",
+    "sortTitle": "wire",
+    "year": 2002,
+    "tvdbId": 79126,
+    "imdbId": "tt0306414",
+    "genres": ["Crime", "Drama"],
+    "tags": [],
+    "added": "2022-01-01T00:00:00Z",
+    "status": "ended",
+    "path": "/tv/The Wire",
+    "runtime": 60,
+    "qualityProfileId": 1,
+    "ratings": {"votes": 1000, "value": 9.3},
+    "statistics": {"sizeOnDisk": 1024}
+}
+
+MOVIES = [
+    {
+        "id": 2,
+        "title": "Heat",
+        "sortTitle": "heat",
+        "year": 1995,
+        "imdbId": "tt0113277",
+        "tmdbId": 949,
+        "genres": ["Crime"],
+        "tags": [],
+        "added": "2022-01-01T00:00:00Z",
+        "status": "released",
+        "path": "/movies/Heat (1995)",
+        "runtime": 170,
+        "hasFile": True,
+        "sizeOnDisk": 1024,
+        "qualityProfileId": 1,
+        "ratings": {
+            "imdb": {"votes": 700000, "value": 8.3, "type": "user"},
+            "tmdb": {"votes": 6000, "value": 7.9, "type": "user"}
+        }
+    },
+    {
+        "id": 3,
+        "title": "Cats",
+        "sortTitle": "cats",
+        "year": 2019,
+        "imdbId": "tt5697572",
+        "tmdbId": 536869,
+        "genres": ["Comedy"],
+        "tags": [],
+        "added": "2022-01-01T00:00:00Z",
+        "status": "released",
+        "path": "/movies/Cats (2019)",
+        "runtime": 110,
+        "hasFile": True,
+        "sizeOnDisk": 1024,
+        "qualityProfileId": 1,
+        "ratings": {
+            "tmdb": {"votes": 2000, "value": 4.5, "type": "user"}
+        }
+    }
+]
+
+
+def test_rating_filter_on_sonarr_payload(bot):
+    arr = FakeArr()
+    arr.media = [Series(arr, data=SERIES)]
+    bot.sonarrNode = arr
+
+    media = bot.getCatalog("serie")
+    filters, sortKey = bot.parseQuery(["rating>7"])
+
+    assert media[0].rating_value == 9.3
+    assert [m.title for m in bot.queryCatalog(
+        "serie", media, filters, sortKey)] == ["The Wire"]
+
+
+def test_rating_filter_on_radarr_payload(bot):
+    arr = FakeArr()
+    arr.media = [Movie(arr, data=data) for data in MOVIES]
+    bot.radarrNode = arr
+
+    media = bot.getCatalog("movie")
+    filters, sortKey = bot.parseQuery(["rating>7"])
+
+    # IMDb first, TMDb when there is no IMDb rating
+    assert {m.title: m.rating_value for m in media} == \
+        {"Heat": 8.3, "Cats": 4.5}
+    assert [m.title for m in bot.queryCatalog(
+        "movie", media, filters, sortKey)] == ["Heat"]
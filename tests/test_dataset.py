@@ -0,0 +1,66 @@
+import gzip
+import os
+import socket
+from threading import Lock, Thread
+
+import pytest
+
+RATINGS = gzip.compress(
+    b"tconst\taverageRating\tnumVotes\n" +
+    b"tt0000001\t5.7\t2000\n" * 5000
+)
+
+
+@pytest.fixture
+def dataset(bot, tmp_path):
+    bot.datasetLock = Lock()
+    bot.datasetChunkSize = 100
+    bot.datasetTimeout = 5
+    bot.datasetKinds = {"movie": "movie", "tvSeries": "serie"}
+    bot.imdb_dataset = True
+    bot.imdb_dataset_refresh_days = 7
+    bot.pixlovarr_dataset_file = str(tmp_path / "imdb.db")
+
+    return bot
+
+
+def serveFile(tmp_path, data):
+    (tmp_path / "title.ratings.tsv.gz").write_bytes(data)
+
+    return tmp_path.as_uri()
+
+
+def serveShortResponse(data):
+    # Announces the full dataset but closes after half of it, like a
+    # dropped download
+
+    server = socket.create_server(("127.0.0.1", 0))
+
+    def respond():
+        conn, _ = server.accept()
+        with conn:
+            conn.recv(65536)
+            conn.sendall(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Length: " + str(len(data)).encode() + b"\r\n"
+                b"\r\n" + data[:len(data) // 2]
+            )
+        server.close()
+
+    Thread(target=respond, daemon=True).start()
+
+    return f"http://127.0.0.1:{server.getsockname()[1]}"
+
+
+@pytest.mark.parametrize("url", [
+    lambda tmp_path: serveFile(tmp_path, RATINGS[:len(RATINGS) // 2]),
+    lambda tmp_path: serveFile(tmp_path, RATINGS[:10] + b"\xff" * 200),
+    lambda tmp_path: serveShortResponse(RATINGS),
+], ids=["truncated gzip", "corrupt gzip", "dropped connection"])
+def test_refresh_survives_a_broken_download(dataset, tmp_path, url):
+    dataset.imdb_dataset_url = url(tmp_path)
+
+    dataset.refreshDataset(None)
+
+    assert not os.path.exists(dataset.pixlovarr_dataset_file)
+    assert dataset.datasetLock.acquire(blocking=False)
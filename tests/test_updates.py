@@ -0,0 +1,112 @@
+import asyncio
+import json
+from queue import Queue
+from threading import Event, Thread
+from time import sleep
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from telegram import Update, User
+from telegram.ext import ExtBot, JobQueue, TypeHandler
+from telegram.ext.utils.webhookhandler import WebhookAppClass
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.netutil import bind_sockets
+
+from conftest import pixlovarr
+
+
+def makeBot():
+    return ExtBot("123:ABC")
+
+
+def post(port, updateID):
+    request = Request(
+        f"http://127.0.0.1:{port}/hook",
+        data=json.dumps({"update_id": updateID}).encode(),
+        headers={"Content-Type": "application/json"}
+    )
+
+    try:
+        with urlopen(request, timeout=5) as response:
+            return response.status
+
+    except HTTPError as e:
+        return e.code
+
+
+def test_webhook_answers_503_on_a_full_queue():
+    # A full update_queue is answered with 503 instead of blocking the
+    # IOLoop of the webhook
+
+    updateQueue = Queue(maxsize=1)
+    app = WebhookAppClass(
+        "/hook", makeBot(), pixlovarr.WebhookUpdateQueue(updateQueue))
+
+    sockets = bind_sockets(0, "127.0.0.1")
+    port = sockets[0].getsockname()[1]
+    started = Event()
+    loops = []
+
+    def serve():
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        HTTPServer(app).add_sockets(sockets)
+        loops.append(IOLoop.current())
+        started.set()
+        IOLoop.current().start()
+
+    Thread(target=serve, daemon=True).start()
+    started.wait(5)
+
+    try:
+        assert post(port, 1) == 200
+        assert post(port, 2) == 503
+        assert updateQueue.qsize() == 1
+
+        updateQueue.get_nowait()
+        assert post(port, 3) == 200
+
+    finally:
+        loops[0].add_callback(loops[0].stop)
+
+
+def test_dispatcher_leaves_updates_in_the_bounded_queue(monkeypatch):
+    # With the workers busy the dispatcher stops taking updates, so the
+    # bounded update_queue fills up and holds up the poller
+
+    monkeypatch.setattr(
+        ExtBot, "bot", property(lambda self: User(1, "bot", True)))
+
+    bot = makeBot()
+    jobQueue = JobQueue()
+    dispatcher = pixlovarr.BoundedDispatcher(
+        bot, Queue(maxsize=3), job_queue=jobQueue, workers=2)
+    jobQueue.set_dispatcher(dispatcher)
+
+    release = Event()
+    dispatcher.add_handler(TypeHandler(
+        Update, lambda update, context: release.wait(5), run_async=True))
+
+    Thread(target=dispatcher.start, daemon=True).start()
+
+    queued = []
+
+    def poll():
+        for updateID in range(10):
+            dispatcher.update_queue.put(Update(updateID))
+            queued.append(updateID)
+
+    Thread(target=poll, daemon=True).start()
+    sleep(0.5)
+
+    try:
+        # 2 running, 1 waiting for a worker and 3 in the update_queue
+        assert len(queued) == 6
+        assert dispatcher.update_queue.qsize() == 3
+
+    finally:
+        release.set()
+        sleep(0.5)
+        dispatcher.stop()
+
+    assert len(queued) == 10